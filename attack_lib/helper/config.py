@@ -0,0 +1,151 @@
+import os
+import re
+import json
+from dataclasses import dataclass, field, fields
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+params_path = os.path.join(script_dir, 'params.json')
+
+# Every key can be overridden from the environment with
+# ENV_PREFIX + the key in upper snake case, e.g. P2PSIM_MINING_FEE
+ENV_PREFIX = "P2PSIM_"
+
+def param(key, integer=False):
+    return field(metadata={"key": key, "integer": integer})
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Immutable simulation parameters, built once from params.json
+    and the overrides (see loadConfig), and shared by the simulator,
+    the nodes and the transactions.
+
+    Attributes (params.json key):
+    - defaultSeed (int): Seed of the random generator (default-seed).
+    - txnSize (float): Size of a transaction in a block (txn-size).
+    - transactionSizeKB (float): Size of a flooded transaction (transaction-size-KB).
+    - blockSizeKB (int): Maximum number of transactions of a block (block-size-KB).
+    - miningFee (float): Coinbase value (mining-fee).
+    - hashingPowerFactor (float): High to low CPU hashing power ratio (hashing-power-factor), unused by the attack simulation, where the honest nodes share their power equally.
+    - startingBalance (float): Balance of every node in the genesis block (starting-balance).
+    - lowPropagationMs, highPropagationMs (float): Range of the link propagation delays.
+    - lowLinkSpeedMbps, highLinkSpeedMbps (float): Link speed of slow and fast nodes.
+    - queuingDelayMeanKb (float): Mean queuing delay numerator (queuing-delay-mean-Kb).
+
+    Derived constants:
+    - lowLinkSpeed, highLinkSpeed (float): Link speeds in bits per second.
+    - queuingDelayMean (float): Queuing delay numerator in bits.
+    """
+    defaultSeed: int = param("default-seed", integer=True)
+    txnSize: float = param("txn-size")
+    transactionSizeKB: float = param("transaction-size-KB")
+    blockSizeKB: int = param("block-size-KB", integer=True)
+    miningFee: float = param("mining-fee")
+    hashingPowerFactor: float = param("hashing-power-factor")
+    startingBalance: float = param("starting-balance")
+    lowPropagationMs: float = param("low-propagation-(ms)")
+    highPropagationMs: float = param("high-propagation-(ms)")
+    lowLinkSpeedMbps: float = param("low-link-speed-Mbps")
+    highLinkSpeedMbps: float = param("high-link-speed-Mbps")
+    queuingDelayMeanKb: float = param("queuing-delay-mean-Kb")
+
+    lowLinkSpeed: float = field(init=False)
+    highLinkSpeed: float = field(init=False)
+    queuingDelayMean: float = field(init=False)
+
+    def __post_init__(self):
+        for f in paramFields():
+            value = getattr(self, f.name)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (f.metadata["integer"] and not isinstance(value, int)):
+                raise ValueError(f"Invalid value for {f.metadata['key']}: {value!r}")
+            if value < 0:
+                raise ValueError(f"{f.metadata['key']} must not be negative")
+        if self.blockSizeKB < 1:
+            raise ValueError("block-size-KB must be at least 1")
+        if self.hashingPowerFactor <= 0:
+            raise ValueError("hashing-power-factor must be positive")
+        if self.lowLinkSpeedMbps <= 0 or self.highLinkSpeedMbps <= 0:
+            raise ValueError("Link speeds must be positive")
+        if self.lowPropagationMs > self.highPropagationMs:
+            raise ValueError("low-propagation-(ms) must not exceed high-propagation-(ms)")
+
+        # Converting to bps and bits
+        object.__setattr__(self, "lowLinkSpeed", self.lowLinkSpeedMbps*(10**6))
+        object.__setattr__(self, "highLinkSpeed", self.highLinkSpeedMbps*(10**6))
+        object.__setattr__(self, "queuingDelayMean", self.queuingDelayMeanKb*1000)
+
+    def __str__(self):
+        res = [f"{f.metadata['key']}: {getattr(self, f.name)}" for f in paramFields()]
+        res.append(f"link-speed-bps (low/high): {self.lowLinkSpeed}/{self.highLinkSpeed}")
+        res.append(f"queuing-delay-mean-bits: {self.queuingDelayMean}")
+        return "\n".join(res)
+
+def paramFields():
+    """
+    Fields of Config read from params.json
+    """
+    return [f for f in fields(Config) if f.init]
+
+def envName(key):
+    """
+    Environment variable overriding a key
+    """
+    return ENV_PREFIX+re.sub(r"[^0-9A-Za-z]+", "_", key).strip("_").upper()
+
+def parseValue(key, text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        raise ValueError(f"Invalid value for {key}: {text!r}")
+
+def loadConfig(path=params_path, overrides=None, environ=None):
+    """
+    Builds the config from the params file, then the\n
+    environment (P2PSIM_* variables) and then the\n
+    overrides (dict key -> value or string to parse)\n
+    Return: Config
+    """
+    with open(path) as f:
+        values = json.load(f)
+    keys = {f.metadata["key"]: f.name for f in paramFields()}
+    unknown = set(values)-set(keys)
+    if unknown:
+        raise ValueError(f"Unknown parameters in {path}: {sorted(unknown)}")
+
+    environ = os.environ if environ is None else environ
+    for key in keys:
+        if envName(key) in environ:
+            values[key] = parseValue(key, environ[envName(key)])
+    for key, value in (overrides or {}).items():
+        if key not in keys:
+            raise ValueError(f"Unknown parameter {key}")
+        values[key] = parseValue(key, value) if isinstance(value, str) else value
+
+    missing = set(keys)-set(values)
+    if missing:
+        raise ValueError(f"Missing parameters: {sorted(missing)}")
+    return Config(**{name: values[key] for key, name in keys.items()})
+
+def parseOverrides(items):
+    """
+    Parses KEY=VALUE command line overrides\n
+    Return: dict
+    """
+    overrides = dict()
+    for item in items:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError(f"Expected KEY=VALUE, got {item!r}")
+        overrides[key.strip()] = value.strip()
+    return overrides
+
+defaultConfig = None
+
+def getDefaultConfig():
+    """
+    Config of params.json and the environment, loaded once
+    """
+    global defaultConfig
+    if defaultConfig is None:
+        defaultConfig = loadConfig()
+    return defaultConfig
@@ -0,0 +1,183 @@
+import heapq
+
+class HeapEventQueue:
+    """
+    Binary heap event queue (reference backend).
+
+    Entries are (time, sequence, event) tuples. The sequence numbers
+    are unique (see eventSequence), so ties on time are popped in the
+    same order whichever order the events were pushed in, and the
+    Event objects are never compared.
+
+    Methods:
+    - push(time, sequence, event): Adds an event to the queue.
+    - pop(): Removes and returns the earliest (time, event).
+    - peek(): Returns the earliest (time, event) without removing it.
+    - compact(isLive): Drops every event for which isLive(event) is False.
+    """
+    def __init__(self):
+        self.heap = []
+
+    def push(self, time, sequence, event):
+        heapq.heappush(self.heap, (time, sequence, event))
+
+    def pop(self):
+        time, _, event = heapq.heappop(self.heap)
+        return time, event
+
+    def peek(self):
+        time, _, event = self.heap[0]
+        return time, event
+
+    def compact(self, isLive):
+        self.heap = [entry for entry in self.heap if isLive(entry[2])]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class CalendarEventQueue:
+    """
+    Calendar queue event queue (R. Brown, 1988).
+
+    Events are hashed by time into a ring of buckets of a fixed width,
+    one "year" being nBuckets*width seconds. Dequeue scans forward from
+    the current bucket and only takes entries belonging to the current
+    year, so enqueue and dequeue are amortized O(1) as long as the
+    bucket width tracks the mean event separation. The ring is resized
+    (and the width re-estimated) whenever the queue size doubles or halves.
+    Each bucket is a small binary heap, and the position of the earliest
+    event is cached between a peek and the following pop or push.
+
+    Ties are broken with the same (time, sequence) key as HeapEventQueue,
+    so both backends pop events in exactly the same order.
+    """
+    def __init__(self, nBuckets=2, width=1.0):
+        self.size = 0
+        self.setup(nBuckets, width, 0.0)
+
+    def setup(self, nBuckets, width, startTime):
+        """
+        (Re)initializes an empty ring of nBuckets
+        buckets of the given width starting at startTime
+        """
+        self.nBuckets = nBuckets
+        self.width = width
+        self.buckets = [[] for _ in range(nBuckets)]
+        self.lastTime = startTime
+        self.seekTo(startTime)
+        self.growAt = 2*nBuckets
+        self.shrinkAt = nBuckets//2-2
+        self.head = None
+
+    def seekTo(self, time):
+        """
+        Points the dequeue cursor to the bucket holding time
+        """
+        self.lastSlot = int(time/self.width)
+        self.lastBucket = self.lastSlot % self.nBuckets
+
+    def push(self, time, sequence, event):
+        entry = (time, sequence, event)
+        heapq.heappush(self.buckets[int(time/self.width) % self.nBuckets], entry)
+        self.size += 1
+        # The cached head only stays if it is still the earliest
+        if self.head is not None and entry < self.head[2]:
+            self.head = None
+        # An event earlier than the cursor moves the cursor back
+        if time < self.lastTime:
+            self.lastTime = time
+            self.seekTo(time)
+        if self.size > self.growAt:
+            self.resize(2*self.nBuckets)
+
+    def insert(self, entry):
+        heapq.heappush(self.buckets[int(entry[0]/self.width) % self.nBuckets], entry)
+
+    def pop(self):
+        if not self.size:
+            raise IndexError("pop from an empty event queue")
+        head = self.head
+        if head is None:
+            head = self.locate()
+        self.head = None
+        self.lastBucket, self.lastSlot, _ = head
+        entry = heapq.heappop(self.buckets[self.lastBucket])
+        self.size -= 1
+        self.lastTime = entry[0]
+        if self.size < self.shrinkAt:
+            self.resize(self.nBuckets//2)
+        return entry[0], entry[2]
+
+    def locate(self):
+        """
+        Finds the earliest event without moving the cursor\n
+        Return: (bucket index, slot, entry) of the event
+        """
+        buckets = self.buckets
+        width = self.width
+        i = self.lastBucket
+        slot = self.lastSlot
+        # Scan one year worth of buckets from the cursor,
+        # slots are compared as integers so float rounding
+        # can never reorder events across buckets
+        for _ in range(self.nBuckets):
+            bucket = buckets[i]
+            if bucket and int(bucket[0][0]/width) <= slot:
+                return i, slot, bucket[0]
+            i += 1
+            if i == self.nBuckets:
+                i = 0
+            slot += 1
+        # Nothing in the current year, jump directly to the earliest event
+        entry = min(bucket[0] for bucket in buckets if bucket)
+        slot = int(entry[0]/width)
+        return slot % self.nBuckets, slot, entry
+
+    def peek(self):
+        head = self.head
+        if head is None:
+            head = self.head = self.locate()
+        return head[2][0], head[2][2]
+
+    def compact(self, isLive):
+        for i in range(self.nBuckets):
+            self.buckets[i] = [entry for entry in self.buckets[i] if isLive(entry[2])]
+            heapq.heapify(self.buckets[i])
+        self.size = sum(len(bucket) for bucket in self.buckets)
+        self.head = None
+
+    def estimateWidth(self):
+        """
+        Estimates the bucket width as three times the mean
+        separation of the earliest events, ignoring outliers
+        """
+        sample = heapq.nsmallest(min(self.size, 25), (entry[0] for bucket in self.buckets for entry in bucket))
+        gaps = [b-a for a, b in zip(sample, sample[1:])]
+        if not gaps:
+            return self.width
+        mean = sum(gaps)/len(gaps)
+        gaps = [gap for gap in gaps if gap <= 2*mean]
+        mean = sum(gaps)/len(gaps) if gaps else 0
+        if mean <= 0:
+            return self.width
+        return 3*mean
+
+    def resize(self, nBuckets):
+        if nBuckets < 2:
+            return
+        entries = [entry for bucket in self.buckets for entry in bucket]
+        width = self.estimateWidth()
+        self.setup(nBuckets, width, self.lastTime)
+        for entry in entries:
+            self.insert(entry)
+
+    def __len__(self):
+        return self.size
+
+
+EVENT_QUEUE_ENGINES = {
+    "heap": HeapEventQueue,
+    "calendar": CalendarEventQueue,
+}
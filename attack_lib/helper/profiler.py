@@ -0,0 +1,191 @@
+import math
+import json
+from time import perf_counter_ns
+
+# Durations are binned on a log scale, 16 bins per
+# doubling, so percentiles are within ~4.5%
+BINS_PER_OCTAVE=16
+
+class ProfileSection:
+    """
+    Timing statistics of one kind of operation.
+
+    Attributes:
+    - count (int): Number of timed operations.
+    - total (int): Cumulative time (ns).
+    - max (int): Longest operation (ns).
+    - histogram (dict): Log-scale bin -> number of operations.
+    """
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.histogram = dict()
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+        bin = int(math.log2(duration)*BINS_PER_OCTAVE) if duration > 0 else -1
+        self.histogram[bin] = self.histogram.get(bin, 0)+1
+
+    def percentile(self, q):
+        """
+        Approximate q-th percentile (ns)
+        """
+        rank = q/100*self.count
+        seen = 0
+        for bin in sorted(self.histogram):
+            seen += self.histogram[bin]
+            if seen >= rank:
+                if bin < 0:
+                    return 0
+                return min(2**((bin+0.5)/BINS_PER_OCTAVE), self.max)
+        return self.max
+
+    def summary(self):
+        """
+        Returns the statistics in seconds
+        """
+        return {
+            "count": self.count,
+            "total": self.total/1e9,
+            "mean": self.total/self.count/1e9 if self.count else 0,
+            "p50": self.percentile(50)/1e9,
+            "p90": self.percentile(90)/1e9,
+            "p99": self.percentile(99)/1e9,
+            "max": self.max/1e9,
+        }
+
+class EventProfiler:
+    """
+    Opt-in instrumentation of the simulation loop.
+
+    Times every event handler call by event type, the event queue
+    pushes and pops (helper.utils) and the orphan block processing
+    of the node classes. Handler times are inclusive: they contain
+    the queue pushes and orphan processing done by the handler.
+    The block events handled after simTime (the drain) are timed in
+    their own section, and are left out of the simulated time span
+    and the event rates.
+
+    Attributes:
+    - labels (tuple[str]): Name of each event type.
+    - sections (dict): Section name -> ProfileSection.
+    - peakQueueDepth (int): Largest number of live events in the queue.
+    - firstTime, lastTime (float): Simulated time span of the handled events, up to simTime.
+    - wallTime (int): Wall time spent in the profiled loop up to simTime (ns).
+    - drainWallTime (int): Wall time spent in the drain (ns).
+
+    Methods:
+    - handle(time, event): Dispatches an event and times its handler.
+    - startDrain(): Accounts for the next events as the drain.
+    - recordQueue(name, duration, depth): Accounts for a queue operation.
+    - install(nodeClasses) / uninstall(): Wraps / restores orphan processing.
+    - summary(): Returns the report as a dict.
+    - printSummary(): Prints the report as a table.
+    - dump(path): Writes the report as JSON.
+    """
+    def __init__(self, labels):
+        self.labels = labels
+        self.sections = {label: ProfileSection() for label in labels}
+        self.sections["queuePush"] = ProfileSection()
+        self.sections["queuePop"] = ProfileSection()
+        self.sections["processOrphanBlocks"] = ProfileSection()
+        self.sections["drain"] = ProfileSection()
+        self.peakQueueDepth = 0
+        self.firstTime = None
+        self.lastTime = None
+        self.wallTime = 0
+        self.drainWallTime = 0
+        self.drainStart = None
+        self.wrapped = []
+
+    def handle(self, time, event):
+        if self.drainStart is not None:
+            start = perf_counter_ns()
+            event.receiverPeer.eventHandler(event)
+            self.sections["drain"].add(perf_counter_ns()-start)
+            return
+        if self.firstTime is None:
+            self.firstTime = time
+        self.lastTime = time
+        start = perf_counter_ns()
+        event.receiverPeer.eventHandler(event)
+        self.sections[self.labels[event.type]].add(perf_counter_ns()-start)
+
+    def startDrain(self):
+        self.drainStart = perf_counter_ns()
+
+    def recordQueue(self, name, duration, depth):
+        self.sections[name].add(duration)
+        if depth > self.peakQueueDepth:
+            self.peakQueueDepth = depth
+
+    def install(self, nodeClasses):
+        """
+        Wraps processOrphanBlocks of the node classes
+        """
+        section = self.sections["processOrphanBlocks"]
+        for cls in nodeClasses:
+            original = cls.__dict__.get("processOrphanBlocks")
+            if original is None:
+                continue
+            def timed(node, *args, original=original):
+                start = perf_counter_ns()
+                result = original(node, *args)
+                section.add(perf_counter_ns()-start)
+                return result
+            cls.processOrphanBlocks = timed
+            self.wrapped.append((cls, original))
+        self.wallStart = perf_counter_ns()
+        self.drainStart = None
+
+    def uninstall(self):
+        for cls, original in self.wrapped:
+            cls.processOrphanBlocks = original
+        self.wrapped = []
+        end = perf_counter_ns()
+        if self.drainStart is None:
+            self.wallTime += end-self.wallStart
+        else:
+            self.wallTime += self.drainStart-self.wallStart
+            self.drainWallTime += end-self.drainStart
+            self.drainStart = None
+
+    def summary(self):
+        span = self.lastTime-self.firstTime if self.firstTime is not None else 0
+        handled = sum(self.sections[label].count for label in self.labels)
+        return {
+            "simulatedTime": span,
+            "wallTime": self.wallTime/1e9,
+            "events": handled,
+            "eventsPerSimulatedSecond": handled/span if span > 0 else 0,
+            "eventsPerWallSecond": handled/self.wallTime*1e9 if self.wallTime else 0,
+            "peakQueueDepth": self.peakQueueDepth,
+            "drainEvents": self.sections["drain"].count,
+            "drainWallTime": self.drainWallTime/1e9,
+            "sections": {name: section.summary() for name, section in self.sections.items() if section.count},
+        }
+
+    def printSummary(self):
+        report = self.summary()
+        print("Event Profile")
+        print(f"Events: {report['events']}, Simulated Time: {report['simulatedTime']:.2f}s, Wall Time: {report['wallTime']:.2f}s")
+        print(f"Events/Simulated Second: {report['eventsPerSimulatedSecond']:.2f}, Events/Wall Second: {report['eventsPerWallSecond']:.0f}, Peak Queue Depth: {report['peakQueueDepth']}")
+        print(f"Drain after simTime: {report['drainEvents']} block events, Wall Time: {report['drainWallTime']:.2f}s")
+        print(f"{'Section':<22}{'Count':>10}{'Total(s)':>11}{'Mean(us)':>10}{'p50(us)':>10}{'p90(us)':>10}{'p99(us)':>10}{'Max(us)':>11}")
+        for name, stats in report["sections"].items():
+            print(f"{name:<22}{stats['count']:>10}{stats['total']:>11.3f}{stats['mean']*1e6:>10.1f}{stats['p50']*1e6:>10.1f}{stats['p90']*1e6:>10.1f}{stats['p99']*1e6:>10.1f}{stats['max']*1e6:>11.1f}")
+        print()
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def __getstate__(self):
+        # The wrappers only live while simulate() runs
+        state = self.__dict__.copy()
+        state["wrapped"] = []
+        return state
@@ -0,0 +1,86 @@
+import os
+import numpy as np
+
+# One fixed-width (packed, 25 bytes) record per processed event,
+# sender/receiver/objectID are -1 when not applicable. objectID
+# is the txn ID for txn events and the block ID for block events
+TRACE_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("type", "u1"),
+    ("sender", "<i4"),
+    ("receiver", "<i4"),
+    ("objectID", "<i8"),
+])
+
+class TraceWriter:
+    """
+    Streams processed events to an append-only binary trace file.
+
+    Records are buffered as tuples and written in batches of
+    bufferSize records. The file holds raw TRACE_DTYPE records
+    without a header, see openTrace.
+
+    Methods:
+    - record(time, event): Appends an event to the trace.
+    - flush(): Writes the buffered records.
+    - close(): Flushes and closes the trace file.
+    """
+    def __init__(self, path, bufferSize=1<<16):
+        self.path = path
+        self.bufferSize = bufferSize
+        self.file = open(path, "wb")
+        self.buffer = []
+        self.written = 0
+
+    def record(self, time, event):
+        if event.txn is not None:
+            objectID = event.txn.txnID
+        elif event.block is not None:
+            objectID = event.block.blockID
+        else:
+            objectID = -1
+        sender = event.senderPeer.nodeID if event.senderPeer is not None else -1
+        receiver = getattr(event.receiverPeer, "nodeID", -1)
+        self.buffer.append((time, event.type, sender, receiver, objectID))
+        if len(self.buffer) >= self.bufferSize:
+            self.flush()
+
+    def flush(self):
+        if self.file is None:
+            self.reopen()
+        if self.buffer:
+            self.file.write(np.array(self.buffer, dtype=TRACE_DTYPE).tobytes())
+            self.written += len(self.buffer)
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __getstate__(self):
+        # Checkpoints keep the number of records written so far,
+        # a resumed run drops whatever was traced after it
+        self.flush()
+        return {"path": self.path, "bufferSize": self.bufferSize, "written": self.written}
+
+    def __setstate__(self, state):
+        # The file is only reopened on the first write,
+        # loading a checkpoint leaves the trace untouched
+        self.__dict__.update(state)
+        self.buffer = []
+        self.file = None
+
+    def reopen(self):
+        self.file = open(self.path, "r+b" if os.path.exists(self.path) else "wb")
+        self.file.truncate(self.written*TRACE_DTYPE.itemsize)
+        self.file.seek(0, os.SEEK_END)
+
+def openTrace(path):
+    """
+    Opens a trace file as a read-only NumPy memmap\n
+    of TRACE_DTYPE records
+    """
+    if os.path.getsize(path) == 0:
+        return np.empty(0, dtype=TRACE_DTYPE)
+    return np.memmap(path, dtype=TRACE_DTYPE, mode="r")
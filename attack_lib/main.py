@@ -1,4 +1,9 @@
 from models.simulator import Simulator
+from models.checkpoint import loadCheckpoint, saveCheckpoint
+from models.parallel import compareToSequential
+from helper.config import loadConfig, parseOverrides
+from models.stop_condition import MainChainLength, MinerUtilizationPrecision
+from models.block_fill import loadBlockFill
 from helper.utils import *
 import argparse
 
@@ -33,8 +38,143 @@ parser.add_argument(
 parser.add_argument(
     "-T", "--simulation_time", default=6000, type=float, help="Time for Simulation"
 )
+parser.add_argument(
+    "-q",
+    "--queue_engine",
+    default="heap",
+    choices=["heap", "calendar"],
+    help="Event Queue Backend",
+)
+parser.add_argument(
+    "-m",
+    "--mining_mode",
+    default="node",
+    choices=["node", "global"],
+    help="Mining Events per Node or a Single Network-wide Block Sampler",
+)
+parser.add_argument(
+    "--txn_store",
+    default="set",
+    choices=["set", "bitset"],
+    help="Backend of the Received Transactions of Each Node",
+)
+parser.add_argument(
+    "--txn_propagation",
+    default="flood",
+    choices=["flood", "path"],
+    help="Transactions Flooded Hop by Hop or Scheduled along Shortest Paths",
+)
+parser.add_argument(
+    "--block_only",
+    action="store_true",
+    help="No Transaction Traffic, Blocks Carry a Synthetic Size",
+)
+parser.add_argument(
+    "--block_fill",
+    default=None,
+    help="Empirical Block Fills for --block_only, One Number of Transactions per Line",
+)
+parser.add_argument(
+    "--revalidate",
+    action="store_true",
+    help="Every Node Validates Every Block, instead of Once per Block",
+)
+parser.add_argument(
+    "-p",
+    "--partitions",
+    default=1,
+    type=int,
+    help="Number of Worker Processes for Conservative Parallel Simulation",
+)
+parser.add_argument(
+    "--check_sequential",
+    action="store_true",
+    help="Rerun with the Sequential Engine and Check that Every Node Log is the Same (with -p)",
+)
+parser.add_argument(
+    "-C",
+    "--checkpoint_interval",
+    default=0,
+    type=float,
+    help="Simulated Time Between Checkpoints (0 Disables)",
+)
+parser.add_argument(
+    "--checkpoint_path",
+    default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "outputs", "checkpoint.gz"),
+    help="Checkpoint File",
+)
+parser.add_argument(
+    "--archive",
+    default=None,
+    help="Move Final Blocks to On-disk Archive Files with this Prefix",
+)
+parser.add_argument(
+    "--finality_depth",
+    default=64,
+    type=int,
+    help="Depth below the Last Block of Every Node Making a Block Final (with --archive)",
+)
+parser.add_argument(
+    "--resume", default=None, help="Resume the Simulation from a Checkpoint File"
+)
+parser.add_argument(
+    "--param",
+    default=[],
+    action="append",
+    metavar="KEY=VALUE",
+    help="Override a params.json Key (Repeatable, Also P2PSIM_<KEY> Environment Variables)",
+)
+parser.add_argument(
+    "--trace", default=None, help="Record Every Processed Event to a Binary Trace File"
+)
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Print Per Event Type Handler and Queue Timings",
+)
+parser.add_argument(
+    "--profile_json", default=None, help="Also Write the Profile to a JSON File"
+)
+parser.add_argument(
+    "--stop_blocks",
+    default=0,
+    type=int,
+    help="Stop Once the Main Chain Holds this Many Blocks (0 Disables)",
+)
+parser.add_argument(
+    "--stop_mpu",
+    default=0,
+    type=float,
+    help="Stop Once the 95%% Confidence Interval of MPU(adv) is Narrower than +/- this Value (0 Disables)",
+)
 
 args = parser.parse_args()
+if args.block_fill and not args.block_only:
+    parser.error("--block_fill needs --block_only")
+if args.archive and args.finality_depth < 1:
+    parser.error("--finality_depth must be at least 1")
+if args.check_sequential and (args.partitions < 2 or args.resume):
+    parser.error("--check_sequential needs -p/--partitions above 1, without --resume")
+if args.partitions < 1:
+    parser.error("-p/--partitions must be at least 1")
+if args.partitions > 1 and args.mining_mode != "node":
+    parser.error("-p/--partitions above 1 needs -m/--mining_mode node")
+if args.partitions > 1 and (args.profile or args.profile_json):
+    parser.error("--profile and --profile_json are not supported with -p/--partitions above 1")
+if args.partitions > 1 and args.txn_propagation != "flood":
+    parser.error("-p/--partitions above 1 needs --txn_propagation flood")
+if args.partitions > 1 and (args.checkpoint_interval > 0 or args.archive):
+    parser.error("-C/--checkpoint_interval and --archive are not supported with -p/--partitions above 1")
+if args.partitions > 1 and args.resume:
+    parser.error("--resume continues a sequential simulation, -p/--partitions must be 1")
+if args.stop_blocks < 0 or args.stop_mpu < 0:
+    parser.error("--stop_blocks and --stop_mpu must not be negative")
+if args.stop_mpu > 0 and args.zeta1 <= 0 and args.zeta2 <= 0:
+    parser.error("--stop_mpu needs a selfish node (-z1 or -z2 above 0)")
+if args.partitions > 1 and (args.stop_blocks > 0 or args.stop_mpu > 0):
+    parser.error("--stop_blocks and --stop_mpu are not supported with -p/--partitions above 1")
+if args.resume and (args.stop_blocks > 0 or args.stop_mpu > 0 or args.archive):
+    parser.error("--stop_blocks, --stop_mpu and --archive are set when a simulation starts, not with --resume")
 
 numHonestNodes = args.num_honest_nodes
 z1 = args.zeta1
@@ -42,14 +182,68 @@ z2 = args.zeta2
 meanInterArrivalTime = args.mean_inter_arrival
 meanMiningTime = args.average_block_mining_time
 simTime = args.simulation_time
+queueEngine = args.queue_engine
+miningMode = args.mining_mode
+partitions = args.partitions
 
-simulator = Simulator(
-    numHonestNodes, z1, z2, meanInterArrivalTime, meanMiningTime, simTime
-)
-simulator.generateNetwork()
-simulator.saveNetworkGraph()
-simulator.generateTransaction()
-simulator.generateBlock()
+if args.resume:
+    simulator = loadCheckpoint(args.resume)
+    print("Simulation resumed at time", simulator.time, "\n")
+else:
+    try:
+        config = loadConfig(overrides=parseOverrides(args.param))
+    except ValueError as e:
+        parser.error(str(e))
+    blockFillSamples = loadBlockFill(args.block_fill) if args.block_fill else None
+    initialize_rand_generator(config.defaultSeed)
+    simulator = Simulator(
+        numHonestNodes,
+        z1,
+        z2,
+        meanInterArrivalTime,
+        meanMiningTime,
+        simTime,
+        queueEngine,
+        miningMode,
+        partitions,
+        config,
+        args.txn_store,
+        args.txn_propagation,
+        args.block_only,
+        blockFillSamples,
+        args.revalidate,
+    )
+    simulator.generateNetwork()
+    simulator.saveNetworkGraph()
+    simulator.generateTransaction()
+    simulator.generateBlock()
+    if args.stop_blocks > 0:
+        simulator.addStopCondition(MainChainLength(args.stop_blocks))
+    if args.stop_mpu > 0:
+        simulator.addStopCondition(
+            MinerUtilizationPrecision(
+                [node.nodeID for node in simulator.nodes[simulator.n_honest :]],
+                args.stop_mpu,
+            )
+        )
+    if args.archive:
+        simulator.setArchive(args.archive, args.finality_depth)
+if args.checkpoint_interval > 0:
+    simulator.setCheckpoint(args.checkpoint_path, args.checkpoint_interval)
+if args.trace:
+    simulator.setTrace(args.trace)
+if args.profile or args.profile_json:
+    simulator.setProfiler(args.profile_json)
+if args.check_sequential:
+    # Start state of the sequential rerun
+    startPath = args.checkpoint_path + ".start"
+    saveCheckpoint(simulator, startPath)
 simulator.simulate()
+if args.check_sequential:
+    different = compareToSequential(simulator, startPath)
+    os.remove(startPath)
+    if different:
+        parser.exit(1, f"Parallel and sequential logs differ for nodes {different}\n")
+    print("Parallel and sequential logs are the same\n")
 simulator.generateStats()
 simulator.saveBlockchainGraph()
\ No newline at end of file
@@ -0,0 +1,115 @@
+# Leaves are tuples of 2**LEAF_BITS consecutive balances,
+# inner nodes are tuples of up to 2**FANOUT_BITS children
+LEAF_BITS = 5
+FANOUT_BITS = 5
+FANOUT = 1 << FANOUT_BITS
+LEAF_MASK = (1 << LEAF_BITS)-1
+
+class BalanceVector:
+    """
+    Persistent (immutable) vector of the balances of the accounts.
+
+    A trie of tuples: each leaf holds the balances of 32 consecutive
+    accounts and inner nodes have 32 children. Updating some accounts
+    returns a new vector which copies only the paths to their leaves and
+    shares every other node with the old one, so a block's balances cost
+    memory and time proportional to the accounts its transactions touch,
+    and a lookup is O(log n).
+
+    Attributes:
+    - root (tuple): Root node.
+    - depth (int): Number of inner levels above the leaves.
+    - size (int): Number of accounts.
+
+    Methods:
+    - fromList(balances): Returns the vector of a list of balances.
+    - __getitem__(account): Balance of an account.
+    - take(accounts): Returns the balances of some accounts.
+    - update(deltas): Returns a new vector with the deltas added.
+    - tolist(): Returns the balances as a list.
+    """
+    __slots__ = ("root", "depth", "size")
+
+    def __init__(self, root=(), depth=0, size=0):
+        self.root = root
+        self.depth = depth
+        self.size = size
+
+    @staticmethod
+    def fromList(balances):
+        balances = list(balances)
+        nodes = [tuple(balances[i:i+(1 << LEAF_BITS)]) for i in range(0, len(balances), 1 << LEAF_BITS)] or [()]
+        depth = 0
+        while len(nodes) > 1:
+            nodes = [tuple(nodes[i:i+FANOUT]) for i in range(0, len(nodes), FANOUT)]
+            depth += 1
+        return BalanceVector(nodes[0], depth, len(balances))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, account):
+        if not 0 <= account < self.size:
+            raise IndexError(f"No account {account}")
+        node = self.root
+        shift = LEAF_BITS+FANOUT_BITS*(self.depth-1)
+        for _ in range(self.depth):
+            node = node[(account >> shift) & (FANOUT-1)]
+            shift -= FANOUT_BITS
+        return node[account & LEAF_MASK]
+
+    def take(self, accounts):
+        return [self[account] for account in accounts]
+
+    def update(self, deltas):
+        """
+        deltas (dict<Account, float>): Change of the balance of each account\n
+        Return: BalanceVector
+        """
+        if not deltas:
+            return self
+        items = sorted(deltas.items())
+        if items[0][0] < 0 or items[-1][0] >= self.size:
+            raise IndexError("Balance update outside of the accounts")
+        return BalanceVector(apply(self.root, self.depth, items), self.depth, self.size)
+
+    def tolist(self):
+        nodes = [self.root]
+        for _ in range(self.depth):
+            nodes = [child for node in nodes for child in node]
+        return [balance for leaf in nodes for balance in leaf]
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __str__(self):
+        return str(self.tolist())
+
+    def __getstate__(self):
+        return (self.root, self.depth, self.size)
+
+    def __setstate__(self, state):
+        self.root, self.depth, self.size = state
+
+def apply(node, level, items):
+    """
+    Returns the copy of node with the sorted\n
+    (account, delta) items added
+    """
+    if level == 0:
+        leaf = list(node)
+        for account, delta in items:
+            leaf[account & LEAF_MASK] += delta
+        return tuple(leaf)
+    children = list(node)
+    shift = LEAF_BITS+FANOUT_BITS*(level-1)
+    start = 0
+    # Accounts are sorted, so each child gets a contiguous run
+    while start < len(items):
+        i = (items[start][0] >> shift) & (FANOUT-1)
+        end = start+1
+        while end < len(items) and (items[end][0] >> shift) & (FANOUT-1) == i:
+            end += 1
+        children[i] = apply(children[i], level-1, items[start:end])
+        start = end
+    return tuple(children)
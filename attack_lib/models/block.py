@@ -1,6 +1,26 @@
 from models.transaction import Transaction
+from models.txn_index import TxnIndex, EMPTY_TXN_INDEX
+from models.balance_vector import BalanceVector
+import numpy as np
 import json,os
 
+# Below this number of transactions the balances of a block
+# are summed in pure Python, the NumPy call overhead dominates
+VECTORIZE_MIN_TXNS = 64
+
+def balanceDeltas(txnIDs, table):
+    """
+    Net balance change of each node touched by the\n
+    transactions txnIDs (stored in table), in NumPy\n
+    Return: (nodes, changes) arrays, sorted by node
+    """
+    rows = table.rows(txnIDs)
+    values = table.values[rows]
+    payments = table.types[rows] == 0
+    nodes = np.concatenate((table.senders[rows[payments]], table.receivers[rows]))
+    nodes, position = np.unique(nodes, return_inverse=True)
+    return nodes, np.bincount(position, weights=np.concatenate((-values[payments], values)))
+
 class Block:
     """
     Represents a Block (A set of transactions) in a peer-to-peer cryptocurrency network.
@@ -9,12 +29,19 @@ class Block:
     - blockID (int): Unique identifier for the block.
     - prevBlockID (int): Unique identifier of the previous block this block is pointing to.
     - txnList (set[Transaction]): Set of unique transactions this block is storing.
+    - txnIDs (np.ndarray[int64]): IDs of the transactions of txnList, stored in their TransactionTable.
     - prevLengthOfChain (int): Length of the chain of the previous block.
     - miner (Node): Node object who mined this block.
-    - balance (list[float]): Previous balance of the nodes before this node is constructed.
+    - balance (BalanceVector): Balance of the nodes after this block, sharing its
+      structure with the balance of the previous block.
+    - deltas (dict<NodeID, float>): Net balance change of the nodes touched by this block.
+    - includedTxns (TxnIndex): IDs of the transactions in the chain ending at this block,
+      sharing its structure with the index of the previous block.
+    - size (float): Size of the transactions, plus syntheticSize (block-only mode).
 
     Methods:
     - __init__(txnID, val, senderPeerID, receiverPeerID, type=0): Initializes a Transaction object.
+    - includesTxn(txnID): Checks if a transaction is in the chain ending at this block.
     - __str__(): Returns a human-readable string representation of the transaction.
     """
     def __init__(
@@ -24,28 +51,53 @@ class Block:
         txnList: set[Transaction],
         prevLengthOfChain: int,
         miner,
-        prevBlockBalance: list[float]
+        prevBlockBalance: BalanceVector,
+        prevIncludedTxns: TxnIndex = None,
+        syntheticSize: float = 0
     ):
         self.blockID: int = blockID
         self.prevBlockID: int = prevBlockID
-        self.size: int = 0
-        self.balance: list[float] = list(prevBlockBalance)
+        self.size: float = syntheticSize
         self.miner = miner
         self.length: int = prevLengthOfChain + 1
         self.txnList: set[Transaction] = txnList
+        self.txnIDs: np.ndarray = np.fromiter((txn.txnID for txn in txnList), dtype=np.int64, count=len(txnList))
+
+        # Every transaction of the simulation is in the same table
+        table = next(iter(txnList)).table if txnList else None
+        if table is not None:
+            self.size += len(self.txnIDs)*table.txnSize
+
+        if prevIncludedTxns is None:
+            prevIncludedTxns = EMPTY_TXN_INDEX
+        self.includedTxns: TxnIndex = prevIncludedTxns.addAll(self.txnIDs.tolist())
+
+        # The genesis block gets its balances as a list
+        if not isinstance(prevBlockBalance, BalanceVector):
+            prevBlockBalance = BalanceVector.fromList(prevBlockBalance)
+        self.updateBalance(prevBlockBalance, table)
 
-        for txn in self.txnList:
-            self.size += txn.size
+    # Update the present balance of the block: net change of each
+    # touched node, over the columns of the txn table for large blocks
+    def updateBalance(self, prevBlockBalance, table):
+        self.deltas: dict[int, float] = dict()
+        if len(self.txnIDs) >= VECTORIZE_MIN_TXNS:
+            nodes, changes = balanceDeltas(self.txnIDs, table)
+            self.deltas = dict(zip(nodes.tolist(), changes.tolist()))
+        else:
+            for txn in self.txnList:
+                if txn.type == 0:
+                    self.deltas[txn.senderPeerID] = self.deltas.get(txn.senderPeerID, 0)-txn.val
+                self.deltas[txn.receiverPeerID] = self.deltas.get(txn.receiverPeerID, 0)+txn.val
+        self.balance: BalanceVector = prevBlockBalance.update(self.deltas)
 
-        self.updateBalance()
+    def includesTxn(self, txnID):
+        """
+        Is the transaction in the chain ending at this block\n
+        Return: bool, in O(log n) without walking the chain
+        """
+        return txnID in self.includedTxns
 
-    # Update the present balance of the block
-    def updateBalance(self):
-        for txn in self.txnList:
-            if txn.type == 0:
-                self.balance[txn.senderPeerID] -= txn.val
-            self.balance[txn.receiverPeerID] += txn.val
-        
     def __str__(self):
         res=""
         res+="BlockID:"+str(self.blockID)+"\n"
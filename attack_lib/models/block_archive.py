@@ -0,0 +1,264 @@
+from collections import OrderedDict
+import numpy as np
+
+# Archived blocks kept as objects for lookups
+ARCHIVE_WINDOW = 256
+
+# Net balance change of a node in an archived block
+DELTA_RECORD = np.dtype([("node", np.int32), ("change", np.float64)])
+
+# Position of the record of an archived block, sorted by block ID
+INDEX_RECORD = np.dtype([("blockID", np.int64), ("position", np.int64)])
+
+# Index entries kept in memory before a merge into path.index
+INDEX_MERGE_MIN = 1024
+
+def blockRecord(numNodes):
+    """
+    Record of an archived block, with its state\n
+    at every node (see BlockStore)
+    """
+    return np.dtype([
+        ("blockID", np.int64),
+        ("prevBlockID", np.int64),
+        ("miner", np.int32),
+        ("length", np.int32),
+        ("size", np.float64),
+        ("txnStart", np.int64),
+        ("txnCount", np.int64),
+        ("deltaStart", np.int64),
+        ("deltaCount", np.int64),
+        ("arrival", np.float64, (numNodes,)),
+        ("status", np.uint8, (numNodes,)),
+    ])
+
+class ArchivedBlock:
+    """
+    Read-only Block read back from a BlockArchive.
+
+    It has the fields of a Block except the balances and the txn index
+    of the chain (an archived block is never a parent again), the
+    transactions are views on the rows txnIDs of the txn table.
+    """
+    __slots__ = ("blockID", "prevBlockID", "miner", "length", "size", "txnIDs", "deltas", "table")
+
+    @property
+    def txnList(self):
+        return {self.table.view(txnID) for txnID in self.txnIDs.tolist()}
+
+    def __str__(self):
+        res=""
+        res+="BlockID:"+str(self.blockID)+"\n"
+        res+="Previous BlockID:"+str(self.prevBlockID)+"\n"
+        res+="Transaction List : "+ str([str(txn) for txn in self.txnList])+"\n"
+        return res
+
+class BlockArchive:
+    """
+    Append-only on-disk store of the final blocks of a simulation.
+
+    Blocks deeper than the finality depth below the tip of every node
+    are moved here by the BlockStore. Each block is a fixed-width record
+    of path.blocks (IDs, miner, length, size, the arrival time and the
+    status bits at every node), pointing to its range of transaction IDs
+    in path.txns and of balance changes in path.deltas. path.index holds
+    the position of each record sorted by block ID, so it grows with the
+    archived blocks and not with the spread of the IDs. The positions of
+    the blocks archived since the last merge are kept in memory, and are
+    merged into path.index once they outnumber it (so archiving n blocks
+    costs O(n log n)), at checkpoints and by flush(). The files are read
+    through memory maps, and the last ARCHIVE_WINDOW blocks looked up are
+    kept as ArchivedBlock objects.
+
+    Loading a checkpoint leaves the files untouched: they are cut back
+    to the archived state on the first append after it, and lookups use
+    an index rebuilt from the records until then.
+
+    Attributes:
+    - path (str): Prefix of the archive files.
+    - numNodes (int): Number of nodes.
+    - nodes (list[Node]): Nodes of the simulation, miners of the blocks.
+    - txnTable (TransactionTable): Table of the transactions of the blocks.
+    - counts (dict<str, int>): Number of entries of each file.
+    - pending (dict<BlockID, int>): Positions of the records not yet in path.index.
+
+    Methods:
+    - append(blocks, arrival, status): Archives blocks with their state at every node.
+    - record(blockID): Returns the record of an archived block, None if not archived.
+    - block(blockID): Returns an archived block as an ArchivedBlock.
+    - records(): Returns every record, in archive order.
+    - flush(): Merges the pending positions into path.index.
+    """
+    def __init__(self, path, numNodes, nodes, txnTable, window=ARCHIVE_WINDOW):
+        self.path = path
+        self.numNodes = numNodes
+        self.nodes = nodes
+        self.txnTable = txnTable
+        self.window = window
+        self.dtypes = {"blocks": blockRecord(numNodes), "txns": np.dtype(np.int64), "deltas": DELTA_RECORD, "index": INDEX_RECORD}
+        self.counts = {name: 0 for name in self.dtypes}
+        for name in self.dtypes:
+            open(self.fileName(name), "wb").close()
+        self.maps = dict()
+        self.cache = OrderedDict()
+        self.pending = dict()
+        self.restored = False
+
+    def fileName(self, name):
+        return f"{self.path}.{name}"
+
+    def column(self, name):
+        """
+        Memory map of a file, remapped after appends
+        """
+        column = self.maps.get(name)
+        if column is None:
+            if name == "index" and self.restored:
+                column = self.rebuildIndex()
+            elif self.counts[name] == 0:
+                column = np.zeros(0, dtype=self.dtypes[name])
+            else:
+                column = np.memmap(self.fileName(name), dtype=self.dtypes[name], mode="r", shape=(self.counts[name],))
+            self.maps[name] = column
+        return column
+
+    def write(self, name, array, mode="ab"):
+        self.maps.pop(name, None)
+        with open(self.fileName(name), mode) as f:
+            f.write(np.ascontiguousarray(array, dtype=self.dtypes[name]).tobytes())
+        self.counts[name] = len(array) if mode == "wb" else self.counts[name]+len(array)
+
+    def rebuildIndex(self):
+        """
+        Index of the records, path.index may have been\n
+        rewritten after the checkpoint this archive is from
+        """
+        index = np.zeros(self.counts["blocks"], dtype=INDEX_RECORD)
+        index["blockID"] = self.column("blocks")["blockID"]
+        index["position"] = np.arange(self.counts["blocks"])
+        return np.sort(index, order="blockID", kind="stable")
+
+    def reopen(self):
+        """
+        Cuts the files back to the archived state,\n
+        on the first append after a checkpoint is loaded
+        """
+        index = self.column("index")
+        for name in ("blocks", "txns", "deltas"):
+            with open(self.fileName(name), "r+b") as f:
+                f.truncate(self.counts[name]*self.dtypes[name].itemsize)
+        self.restored = False
+        self.write("index", index, mode="wb")
+
+    def flush(self):
+        if not self.pending:
+            return
+        entries = np.zeros(len(self.pending), dtype=INDEX_RECORD)
+        entries["blockID"] = list(self.pending.keys())
+        entries["position"] = list(self.pending.values())
+        index = np.concatenate((self.column("index"), entries))
+        self.write("index", np.sort(index, order="blockID", kind="stable"), mode="wb")
+        self.pending = dict()
+
+    def append(self, blocks, arrival, status):
+        """
+        blocks (list[Block]): Blocks to archive\n
+        arrival, status (np.ndarray): State of each block (rows) at every node (columns)
+        """
+        if self.restored:
+            self.reopen()
+        records = np.zeros(len(blocks), dtype=self.dtypes["blocks"])
+        txnStart = self.counts["txns"]
+        deltaStart = self.counts["deltas"]
+        txnIDs = []
+        deltas = []
+        for i, block in enumerate(blocks):
+            record = records[i]
+            record["blockID"] = block.blockID
+            record["prevBlockID"] = block.prevBlockID
+            record["miner"] = -1 if block.miner is None else block.miner.nodeID
+            record["length"] = block.length
+            record["size"] = block.size
+            record["txnStart"] = txnStart
+            record["txnCount"] = len(block.txnIDs)
+            record["deltaStart"] = deltaStart
+            record["deltaCount"] = len(block.deltas)
+            txnIDs.append(block.txnIDs)
+            deltas.extend(block.deltas.items())
+            txnStart += len(block.txnIDs)
+            deltaStart += len(block.deltas)
+        records["arrival"] = arrival
+        records["status"] = status
+
+        first = self.counts["blocks"]
+        self.write("blocks", records)
+        self.write("txns", np.concatenate(txnIDs) if txnIDs else np.zeros(0, dtype=np.int64))
+        self.write("deltas", np.array(deltas, dtype=DELTA_RECORD))
+
+        self.pending.update(zip(records["blockID"].tolist(), range(first, first+len(blocks))))
+        if len(self.pending) > max(self.counts["index"], INDEX_MERGE_MIN):
+            self.flush()
+
+    def find(self, blockID):
+        """
+        Position of the record of a block, -1 if not archived
+        """
+        position = self.pending.get(blockID)
+        if position is not None:
+            return position
+        index = self.column("index")
+        i = int(np.searchsorted(index["blockID"], blockID))
+        if i == len(index) or index[i]["blockID"] != blockID:
+            return -1
+        return int(index[i]["position"])
+
+    def record(self, blockID):
+        position = self.find(blockID)
+        if position < 0:
+            return None
+        return self.column("blocks")[position]
+
+    def block(self, blockID):
+        block = self.cache.get(blockID)
+        if block is not None:
+            self.cache.move_to_end(blockID)
+            return block
+        record = self.record(blockID)
+        if record is None:
+            raise KeyError(blockID)
+        block = ArchivedBlock()
+        block.blockID = int(record["blockID"])
+        block.prevBlockID = int(record["prevBlockID"])
+        block.miner = None if record["miner"] < 0 else self.nodes[int(record["miner"])]
+        block.length = int(record["length"])
+        block.size = float(record["size"])
+        start = int(record["txnStart"])
+        block.txnIDs = np.array(self.column("txns")[start:start+int(record["txnCount"])])
+        start = int(record["deltaStart"])
+        deltas = self.column("deltas")[start:start+int(record["deltaCount"])]
+        block.deltas = dict(zip(deltas["node"].tolist(), deltas["change"].tolist()))
+        block.table = self.txnTable
+        self.cache[blockID] = block
+        if len(self.cache) > self.window:
+            self.cache.popitem(last=False)
+        return block
+
+    def records(self):
+        return self.column("blocks")
+
+    def __len__(self):
+        return self.counts["blocks"]
+
+    def __getstate__(self):
+        self.flush()
+        state = dict(self.__dict__)
+        state["maps"] = dict()
+        state["cache"] = OrderedDict()
+        return state
+
+    def __setstate__(self, state):
+        # The files are only cut back on the first append,
+        # loading a checkpoint leaves the archive untouched
+        self.__dict__.update(state)
+        self.restored = True
+        self.maps = dict()
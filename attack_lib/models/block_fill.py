@@ -0,0 +1,53 @@
+import math
+import numpy as np
+
+class BlockFill:
+    """
+    Synthetic number of transactions of a block, for the block-only mode.
+
+    Without samples, the fill follows the selection rule of prepareBlock
+    (uniform between 1 and the pending transactions, capped at the block
+    size minus the coinbase) applied to a pool of Poisson(meanPending)
+    transactions (the steady-state pool of the full simulation). With
+    samples, the fill is drawn from them (an empirical distribution,
+    e.g. the blocks of a full run).
+
+    Attributes:
+    - meanPending (float): Mean number of pending transactions.
+    - blockSize (int): Maximum number of transactions of a block, coinbase included.
+    - samples (list[int] | None): Empirical fills.
+
+    Methods:
+    - draw(rng): Returns the number of transactions of a new block, coinbase excluded.
+    """
+    def __init__(self, meanPending, blockSize, samples=None):
+        if samples is not None and len(samples) == 0:
+            raise ValueError("Empty Block Fill Samples")
+        self.meanPending = meanPending
+        self.blockSize = blockSize
+        self.samples = samples
+
+    def draw(self, rng):
+        """
+        rng (np.random.Generator): Random stream of the miner
+        """
+        if self.samples is not None:
+            return self.samples[rng.integers(len(self.samples))]
+        if math.isinf(self.meanPending):
+            pending = self.blockSize
+        else:
+            pending = int(rng.poisson(self.meanPending))
+        if pending <= 1:
+            return pending
+        return min(int(rng.integers(1, pending+1)), self.blockSize-1)
+
+def loadBlockFill(path):
+    """
+    Reads empirical block fills, one number of\n
+    transactions (coinbase excluded) per line\n
+    Return: list[int]
+    """
+    samples = np.loadtxt(path, dtype=int, ndmin=1).tolist()
+    if any(fill < 0 for fill in samples):
+        raise ValueError("Block fills must not be negative")
+    return samples
@@ -1,6 +1,16 @@
 from models.transaction import Transaction
 from models.block import Block
 
+# Name of the node method handling each event type
+EVENT_HANDLERS = ("generateTXN", "receiveTXN", "mineBlock", "finishMine", "receiveBlock")
+
+def buildDispatchTable(cls):
+    """
+    Returns the event handlers of a node class\n
+    indexed by event type
+    """
+    return tuple(getattr(cls, name) for name in EVENT_HANDLERS)
+
 class Event:
     """
     Represents an event in a peer-to-peer network.
@@ -12,6 +22,8 @@ class Event:
     - block (int,optional): Block Object associated with the event.
     - senderPeer (Node,optional): Sender Node Object associated with the event.
     - receiverPeer (Node,optional): Receiver Node Object associated with the event.
+    - generation (int,optional): Mining process generation of a Finish Mining event.
+    - sequence (int): Tiebreak in the event queue, set when the event is pushed.
 
     EVENT_TYPES:
         0 - Txn is Generated by a Node\n
@@ -19,11 +31,16 @@ class Event:
         2 - Start Mining a Block\n
         3 - Finish Mining a Block\n
         4 - Receive a Block\n
+        5 - Block Found by the Network (global mining mode)\n
 
     Methods:
-    - __init__(time, type, txn=None, block=None, senderPeer=None, receiverPeer=None): Initializes an Event object.
+    - __init__(time, type, txn=None, block=None, senderPeer=None, receiverPeer=None, generation=None): Initializes an Event object.
     - __str__(): Returns a human-readable string representation of the event.
+
+    Events are slotted, there are tens of millions of them in large runs.
     """
+    __slots__ = ("time", "type", "txn", "block", "senderPeer", "receiverPeer", "generation", "sequence")
+
     def __init__(
         self,
         time: float,
@@ -32,6 +49,7 @@ class Event:
         block: Block = None,
         senderPeer = None,
         receiverPeer = None,
+        generation: int = None,
     ):
         """
         Initializes an Event object.
@@ -42,6 +60,8 @@ class Event:
         self.block: Block = block
         self.senderPeer = senderPeer
         self.receiverPeer = receiverPeer
+        self.generation: int = generation
+        self.sequence: int = None
 
     def __str__(self):
         """
@@ -62,4 +82,5 @@ class Event:
     
     def __lt__(self, other):
         # Compare events based on their time attribute
-        return self.time <= other.time
+        # (the event queue breaks ties with a sequence number)
+        return self.time < other.time
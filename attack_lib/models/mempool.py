@@ -0,0 +1,61 @@
+class Mempool:
+    """
+    Pending transactions of a node: received and not yet included
+    in the chain ending at the block the pool is synced to.
+
+    The pool is updated incrementally, on every received transaction
+    and on every tip move, where only the blocks between the old and
+    the new tip are visited. Transactions of blocks disconnected by a
+    reorganization go back to the pool. Inclusion in the chain is
+    checked with the persistent txn index of the tip block.
+
+    Attributes:
+    - tip (Block): Block the pool is synced to.
+    - pending (dict<TxnID, Txn>): Pending transactions, in arrival order.
+
+    Methods:
+    - add(txn): Adds a received transaction.
+    - syncTo(block, blocks, received): Moves the tip to block.
+    """
+    def __init__(self, genesisBlock):
+        self.tip = genesisBlock
+        self.pending = dict()
+
+    def add(self, txn):
+        if not self.tip.includesTxn(txn.txnID):
+            self.pending[txn.txnID] = txn
+
+    def syncTo(self, block, blocks, received):
+        """
+        Moves the tip to block\n
+        blocks (dict<BlockID, Block>): Blocks of the node, holding both branches\n
+        received (set[Txn]): Transactions received by the node
+        """
+        if block.blockID == self.tip.blockID:
+            return
+        old, new = self.tip, block
+        disconnected = []
+        connected = []
+        # Walk both branches back to the fork point
+        while old.length > new.length:
+            disconnected.append(old)
+            old = blocks[old.prevBlockID]
+        while new.length > old.length:
+            connected.append(new)
+            new = blocks[new.prevBlockID]
+        while old.blockID != new.blockID:
+            disconnected.append(old)
+            old = blocks[old.prevBlockID]
+            connected.append(new)
+            new = blocks[new.prevBlockID]
+
+        # Txn sets are walked in ID order, the pool order
+        # must not depend on the layout of the sets
+        for oldBlock in disconnected:
+            for txn in sorted(oldBlock.txnList, key=lambda txn: txn.txnID):
+                if txn in received and not block.includesTxn(txn.txnID):
+                    self.pending[txn.txnID] = txn
+        for newBlock in connected:
+            for txn in newBlock.txnList:
+                self.pending.pop(txn.txnID, None)
+        self.tip = block
@@ -0,0 +1,85 @@
+from helper.utils import *
+from models.event import Event
+
+def buildAliasTable(weights):
+    """
+    Builds Vose's alias table for the given weights\n
+    Return: (probability list, alias list)
+    """
+    n = len(weights)
+    total = sum(weights)
+    scaled = [w*n/total for w in weights]
+    prob = [1.0]*n
+    alias = list(range(n))
+
+    small = [i for i in range(n) if scaled[i] < 1]
+    large = [i for i in range(n) if scaled[i] >= 1]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] -= 1-scaled[s]
+        if scaled[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+    # Leftovers are 1 up to rounding errors
+    return prob, alias
+
+class MiningSampler:
+    """
+    Samples block discoveries for the whole network.
+
+    The per-node exponential mining races are merged into a single
+    Poisson process with rate sum(1/mineTime), and the winner of each
+    discovery is drawn proportionally to its hashing rate from an alias
+    table. Only one mining event is pending in the queue for the network.
+    The sampler has the lane after the nodes (see initialize_id_spaces),
+    for its random stream and the IDs of its events.
+
+    Attributes:
+    - nodes (list[Node]): Nodes taking part in the race.
+    - nodeID (int): Lane of the sampler.
+    - rng (np.random.Generator): Random stream of the sampler.
+    - meanInterval (float): Mean time between two blocks in the network.
+    - prob, alias (list): Alias table over the nodes.
+    - lastFound (Event): Finish mining event of the last discovery winner.
+    """
+    def __init__(self, nodes):
+        self.nodes = nodes
+        rates = [1/node.mineTime for node in nodes]
+        self.meanInterval = 1/sum(rates)
+        self.prob, self.alias = buildAliasTable(rates)
+        self.nodeID = len(nodes)
+        self.rng = nodeRandomGenerator(self.nodeID)
+        self.eventCount = 0
+        self.lastFound = None
+
+    def drawWinner(self):
+        """
+        Draws the node which found the block
+        """
+        # A single uniform gives both the column and the coin
+        u = self.rng.random()*len(self.nodes)
+        i = min(int(u), len(self.nodes)-1)
+        if u-i < self.prob[i]:
+            return self.nodes[i]
+        return self.nodes[self.alias[i]]
+
+    def scheduleNext(self, time):
+        """
+        Schedules the next block discovery
+        """
+        t = time + self.rng.exponential(self.meanInterval)
+        pushToEventQueue(Event(time=t, type=5, receiverPeer=self))
+
+    def eventHandler(self, event):
+        """
+        Block discovery: the winner finishes
+        mining on its current tip
+        """
+        if event.type != 5:
+            raise ValueError(f"Event Type not Valid")
+        self.lastFound = self.drawWinner().blockFound(event.time)
+        self.scheduleNext(event.time)
@@ -0,0 +1,270 @@
+import io
+import pickle
+import multiprocessing
+from helper.utils import *
+from models.block import Block
+from models.transaction import Transaction
+from helper.trace import TraceWriter
+from models.checkpoint import loadCheckpoint
+
+# Process-wide registries, every copy of a block or
+# transaction received from another process maps to one object
+blockRegistry = dict()
+txnRegistry = dict()
+
+class PartitionChannel:
+    """
+    Pickles events and node state exchanged between processes.
+
+    Nodes travel as their IDs. Blocks and transactions are sent in full
+    the first time they go through the channel and as bare IDs afterwards,
+    on load they are interned in the process-wide registries. A transaction
+    is sent as its row of the txn table, and stored in txnTable on load.
+    Blocks every process already has (genesis) are never sent in full.
+
+    Methods:
+    - dumps(obj): Returns the pickled bytes of obj.
+    - loads(data): Returns the object pickled in data.
+    """
+    def __init__(self, nodes, txnTable, sharedBlocks=()):
+        self.nodes = nodes
+        self.txnTable = txnTable
+        self.nodeTypes = tuple({type(node) for node in nodes})
+        self.sentBlocks = set(sharedBlocks)
+        self.sentTxns = set()
+
+    def persistentID(self, obj):
+        if isinstance(obj, self.nodeTypes):
+            return ("node", obj.nodeID)
+        if isinstance(obj, Block):
+            blockRegistry.setdefault(obj.blockID, obj)
+            if obj.blockID in self.sentBlocks:
+                return ("block", obj.blockID)
+            self.sentBlocks.add(obj.blockID)
+            # The txn index and the balances are rebuilt on top of
+            # the parent's when the receiver has the parent, to share them
+            if obj.prevBlockID in self.sentBlocks:
+                state = dict(obj.__dict__)
+                del state["includedTxns"]
+                del state["balance"]
+                return ("block", obj.blockID, state)
+            return ("block", obj.blockID, obj.__dict__)
+        if isinstance(obj, Transaction):
+            txnRegistry.setdefault(obj.txnID, obj)
+            if obj.txnID in self.sentTxns:
+                return ("txn", obj.txnID)
+            self.sentTxns.add(obj.txnID)
+            return ("txn", obj.txnID, obj.table.row(obj.txnID))
+        return None
+
+    def persistentLoad(self, pid):
+        if pid[0] == "node":
+            return self.nodes[pid[1]]
+        if pid[0] == "txn":
+            txn = txnRegistry.get(pid[1])
+            if txn is None:
+                self.txnTable.add(pid[1], *pid[2])
+                txn = txnRegistry[pid[1]] = self.txnTable.view(pid[1])
+            return txn
+        obj = blockRegistry.get(pid[1])
+        if obj is None:
+            obj = Block.__new__(Block)
+            obj.__dict__.update(pid[2])
+            if "includedTxns" not in pid[2]:
+                parent = blockRegistry[obj.prevBlockID]
+                obj.includedTxns = parent.includedTxns.addAll(obj.txnIDs.tolist())
+                obj.balance = parent.balance.update(obj.deltas)
+            blockRegistry[pid[1]] = obj
+        return obj
+
+    def dumps(self, obj):
+        buffer = io.BytesIO()
+        pickler = pickle.Pickler(buffer, pickle.HIGHEST_PROTOCOL)
+        pickler.persistent_id = self.persistentID
+        pickler.dump(obj)
+        return buffer.getvalue()
+
+    def loads(self, data):
+        unpickler = pickle.Unpickler(io.BytesIO(data))
+        unpickler.persistent_load = self.persistentLoad
+        return unpickler.load()
+
+def partitionNetwork(nodes, numPartitions):
+    """
+    Splits the nodes into numPartitions connected-ish\n
+    groups of equal size, by cutting a BFS order\n
+    Return: list of partition of each node
+    """
+    order = []
+    seen = [False]*len(nodes)
+    for root in nodes:
+        if seen[root.nodeID]:
+            continue
+        seen[root.nodeID] = True
+        queue = [root]
+        for node in queue:
+            order.append(node.nodeID)
+            for peer in sorted(node.neighbors, key=lambda peer: peer.nodeID):
+                if not seen[peer.nodeID]:
+                    seen[peer.nodeID] = True
+                    queue.append(peer)
+
+    owner = [0]*len(nodes)
+    for i, nodeID in enumerate(order):
+        owner[nodeID] = i*numPartitions//len(nodes)
+    return owner
+
+def computeLookahead(nodes, owner, latencyMatrix):
+    """
+    Lower bound of the delay of any message between\n
+    two partitions: the smallest propagation delay\n
+    of a cut link (transmission and queuing only add)\n
+    Return: float (seconds)
+    """
+    lookahead = float("inf")
+    for node in nodes:
+        for peer in node.neighbors:
+            if owner[node.nodeID] != owner[peer.nodeID]:
+                lookahead = min(lookahead, latencyMatrix[node.nodeID, peer.nodeID]/1000)
+    return lookahead
+
+def runPartition(conn, simulator, owner, partition, numPartitions):
+    """
+    Worker process: simulates the nodes of one partition,\n
+    in windows granted by the coordinator
+    """
+    outbox = []
+    enterPartition(owner, partition, outbox)
+    blockRegistry[simulator.genesis.blockID] = simulator.genesis
+    channels = [PartitionChannel(simulator.nodes, simulator.txnTable, [simulator.genesis.blockID]) for _ in range(numPartitions)]
+    loader = PartitionChannel(simulator.nodes, simulator.txnTable, [simulator.genesis.blockID])
+    trace = TraceWriter(f"{simulator.tracePath}.{partition}") if simulator.tracePath else None
+
+    while True:
+        # Report the next local event and
+        # the messages sent during the last window
+        payloads = [None]*numPartitions
+        messageTimes = [float("inf")]*numPartitions
+        if outbox:
+            eventsTo = [[] for _ in range(numPartitions)]
+            for event in outbox:
+                q = owner[event.receiverPeer.nodeID]
+                eventsTo[q].append(event)
+                messageTimes[q] = min(messageTimes[q], event.time)
+            for q, events in enumerate(eventsTo):
+                if events:
+                    payloads[q] = channels[q].dumps(events)
+            outbox.clear()
+        conn.send((nextEventTime(), messageTimes, payloads))
+
+        command = conn.recv()
+        if command is None:
+            break
+        windowEnd, inbound = command
+        for data in inbound:
+            for event in loader.loads(data):
+                pushToEventQueue(event)
+
+        # Every event before the window end is safe
+        while nextEventTime() < windowEnd:
+            time, event = popFromEventQueue()
+            # After simTime only block events are processed
+            if time <= simulator.simTime or event.type == 3 or event.type == 4:
+                event.receiverPeer.eventHandler(event)
+                if trace is not None:
+                    trace.record(time, event)
+
+    if trace is not None:
+        trace.close()
+
+    # Ship the final state of the nodes of this partition
+    states = dict()
+    for node in simulator.nodes:
+        if owner[node.nodeID] == partition:
+            states[node.nodeID] = {key: value for key, value in node.__dict__.items() if key not in ("neighbors", "latencyMatrix", "config", "txnTable")}
+    conn.send(PartitionChannel(simulator.nodes, simulator.txnTable, [simulator.genesis.blockID]).dumps(states))
+    conn.close()
+
+def receive(conn, partition):
+    try:
+        return conn.recv()
+    except EOFError:
+        raise RuntimeError(f"Partition {partition} worker failed")
+
+def simulateConservative(simulator, numPartitions):
+    """
+    Conservative (YAWNS) parallel simulation.
+
+    The network is split into numPartitions partitions, each simulated by
+    a forked worker process, and time advances in synchronous windows.
+    Messages between partitions take at least lookahead, the smallest
+    latency of a link between two partitions. If T(p) is the earliest
+    pending event or message of partition p, anything partition q can
+    still receive is later than min(T(p)+lookahead for p!=q, T(q)+2*lookahead)
+    (the second term being a reply to q's own messages), so q processes
+    every event before that bound. Messages are exchanged through the
+    coordinator at the end of every window.
+
+    Every node draws from its own random stream and hands out its own
+    block, txn and event IDs (see nodeRandomGenerator), and the event
+    queue breaks ties on the event IDs, so a node handles the same events
+    in the same order whichever partition simulates it. The results are
+    those of the sequential engine for the same seed, whatever the number
+    of partitions (compareToSequential checks it).
+    """
+    owner = partitionNetwork(simulator.nodes, numPartitions)
+    lookahead = computeLookahead(simulator.nodes, owner, simulator.latencyMatrix)
+    print(f"Partitions: {numPartitions}, Lookahead: {lookahead}s")
+
+    context = multiprocessing.get_context("fork")
+    conns = []
+    workers = []
+    for partition in range(numPartitions):
+        parentConn, childConn = context.Pipe()
+        worker = context.Process(target=runPartition, args=(childConn, simulator, owner, partition, numPartitions), daemon=True)
+        worker.start()
+        childConn.close()
+        conns.append(parentConn)
+        workers.append(worker)
+
+    # The events now live in the workers
+    initialize_event_queue(simulator.queueEngine)
+
+    try:
+        while True:
+            reports = [receive(conn, partition) for partition, conn in enumerate(conns)]
+            lowerBound = [min([nextTime]+[messageTimes[q] for _, messageTimes, _ in reports]) for q, (nextTime, _, _) in enumerate(reports)]
+            if min(lowerBound) == float("inf"):
+                break
+            for q, conn in enumerate(conns):
+                windowEnd = min([lowerBound[p]+lookahead for p in range(numPartitions) if p != q]+[lowerBound[q]+2*lookahead])
+                conn.send((windowEnd, [payloads[q] for _, _, payloads in reports if payloads[q] is not None]))
+
+        for conn in conns:
+            conn.send(None)
+        blockRegistry[simulator.genesis.blockID] = simulator.genesis
+        loader = PartitionChannel(simulator.nodes, simulator.txnTable, [simulator.genesis.blockID])
+        for partition, conn in enumerate(conns):
+            for nodeID, state in loader.loads(receive(conn, partition)).items():
+                simulator.nodes[nodeID].__dict__.update(state)
+                # The worker's copy of the block store is merged back
+                simulator.nodes[nodeID].blockchain.moveTo(simulator.blockStore)
+    except BaseException:
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+def compareToSequential(simulator, path):
+    """
+    Runs the simulation saved at path (before the\n
+    parallel run of simulator) with the sequential\n
+    engine, and compares the logs of the nodes\n
+    Return: IDs of the nodes whose logs differ
+    """
+    sequential = loadCheckpoint(path)
+    sequential.partitions = 1
+    sequential.simulate()
+    return [nodeID for nodeID, (log, sequentialLog) in enumerate(zip(simulator.nodeLogs(), sequential.nodeLogs())) if log != sequentialLog]
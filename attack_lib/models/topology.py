@@ -0,0 +1,171 @@
+import numpy as np
+import networkx as nx
+
+# Bounds of the number of peers of a node
+MIN_PEERS = 3
+MAX_PEERS = 6
+
+# Random draws before a full scan for a node with a free peer slot
+SPARE_TRIES = 8
+
+class PeerGraph:
+    """
+    Undirected peer-to-peer graph in CSR arrays: the peers of
+    node i are peers[indptr[i]:indptr[i+1]], in ID order.
+
+    Attributes:
+    - indptr (np.ndarray[int64]): Start of the peers of each node, and the end.
+    - peers (np.ndarray[int32]): Peers of all the nodes.
+
+    Methods:
+    - neighbors(nodeID): Returns the peers of a node.
+    - edges(): Returns the links as (node, peer) pairs, node < peer.
+    - toNetworkX(): Returns the graph as a NetworkX Graph, for drawing.
+    """
+    def __init__(self, indptr, peers):
+        self.indptr = indptr
+        self.peers = peers
+
+    def __len__(self):
+        return len(self.indptr)-1
+
+    def neighbors(self, nodeID):
+        return self.peers[self.indptr[nodeID]:self.indptr[nodeID+1]].tolist()
+
+    def edges(self):
+        sources = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+        forward = sources < self.peers
+        return zip(sources[forward].tolist(), self.peers[forward].tolist())
+
+    def toNetworkX(self):
+        G = nx.Graph()
+        G.add_nodes_from(range(len(self)))
+        G.add_edges_from(self.edges())
+        return G
+
+def randomPeerGraph(n, rng):
+    """
+    Random connected graph of n nodes with MIN_PEERS to\n
+    MAX_PEERS peers each, built in O(N·d) without retries\n
+    rng (np.random.Generator): Source of randomness\n
+    Return: PeerGraph
+    """
+    adjacency = [set() for _ in range(n)]
+
+    # Stub matching: every node offers its drawn number of
+    # peers, the stubs are paired at random, and self-links
+    # and repeated links are dropped, so no node exceeds it
+    wanted = rng.integers(MIN_PEERS, MAX_PEERS+1, size=n)
+    stubs = rng.permutation(np.repeat(np.arange(n), wanted)).tolist()
+    for a, b in zip(stubs[0::2], stubs[1::2]):
+        if a != b:
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+
+    # Nodes left below the minimum get more peers
+    target = min(MIN_PEERS, n-1)
+    for node in range(n):
+        while len(adjacency[node]) < target:
+            peer = sparePeer(adjacency, range(n), rng, exclude=node)
+            if peer is None:
+                break
+            adjacency[node].add(peer)
+            adjacency[peer].add(node)
+
+    # Components by union-find, then stitched in a chain
+    parent = list(range(n))
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for a in range(n):
+        for b in adjacency[a]:
+            if a < b:
+                parent[find(a)] = find(b)
+    components = dict()
+    for node in range(n):
+        components.setdefault(find(node), []).append(node)
+    components = list(components.values())
+    connected = components[0] if components else []
+    for component in components[1:]:
+        a = sparePeer(adjacency, connected, rng)
+        b = sparePeer(adjacency, component, rng)
+        adjacency[a].add(b)
+        adjacency[b].add(a)
+        connected.extend(component)
+
+    indptr = np.zeros(n+1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(peers) for peers in adjacency])
+    peers = np.fromiter((peer for peers in adjacency for peer in sorted(peers)), dtype=np.int32, count=int(indptr[-1]))
+    return PeerGraph(indptr, peers)
+
+def sparePeer(adjacency, nodes, rng, exclude=None):
+    """
+    A node of nodes with fewer than MAX_PEERS peers,\n
+    not exclude nor one of its peers (None if there is\n
+    none). Without an excluded node, in a component\n
+    where every node has MAX_PEERS peers a link is\n
+    dropped to free a slot: all the degrees are even\n
+    then, so no link is a bridge and the component\n
+    stays connected
+    """
+    def free(node):
+        return len(adjacency[node]) < MAX_PEERS and node != exclude and (exclude is None or node not in adjacency[exclude])
+    for _ in range(SPARE_TRIES):
+        node = nodes[int(rng.integers(len(nodes)))]
+        if free(node):
+            return node
+    for i in rng.permutation(len(nodes)).tolist():
+        if free(nodes[i]):
+            return nodes[i]
+    if exclude is not None:
+        return None
+    node = nodes[int(rng.integers(len(nodes)))]
+    peer = min(adjacency[node])
+    adjacency[node].discard(peer)
+    adjacency[peer].discard(node)
+    return node
+
+class LinkLatencies:
+    """
+    Propagation delay (ms) of every directed link of a PeerGraph,
+    drawn uniformly in [low, high) once the graph is generated.
+
+    Only the links are kept, instead of a dense matrix over all the
+    pairs of nodes, and they are read like one: latencyMatrix[i, j]
+    for a link, or arrays of i and j for many links at once.
+
+    Attributes:
+    - low, high (float): Range of the delays.
+    - keys (np.ndarray[int64]): i*n+j of each link, sorted.
+    - values (np.ndarray[float64]): Delay of each link.
+    - rows (list[dict<NodeID, float>]): Delay of the links of each node.
+
+    Methods:
+    - draw(graph, rng): Draws the delays of the links of graph.
+    """
+    def __init__(self, low, high):
+        self.low = low
+        self.high = high
+        self.n = 0
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.values = np.zeros(0)
+        self.rows = []
+
+    def draw(self, graph, rng):
+        self.n = len(graph)
+        sources = np.repeat(np.arange(self.n, dtype=np.int64), np.diff(graph.indptr))
+        self.keys = sources*self.n+graph.peers
+        self.values = rng.uniform(self.low, self.high, len(graph.peers))
+        self.rows = [dict(zip(graph.neighbors(i), self.values[graph.indptr[i]:graph.indptr[i+1]].tolist())) for i in range(self.n)]
+
+    def __getitem__(self, key):
+        i, j = key
+        if isinstance(i, (int, np.integer)):
+            return self.rows[i][j]
+        keys = np.asarray(i, dtype=np.int64)*self.n+np.asarray(j)
+        position = np.searchsorted(self.keys, keys)
+        if not np.array_equal(self.keys[np.minimum(position, len(self.keys)-1)], keys):
+            raise KeyError("Latency of nodes which are not peers")
+        return self.values[position]
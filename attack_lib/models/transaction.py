@@ -1,11 +1,126 @@
-import json, os
+import numpy as np
+from helper.config import getDefaultConfig
+from helper.utils import idLanes
+
+# The columns grow by whole chunks of rows
+TABLE_CHUNK = 4096
+
+# Rows are handed to the ID lanes by runs of 2**LANE_RUN_BITS
+LANE_RUN_BITS = 8
+
+class TransactionTable:
+    """
+    Columnar store of the transactions of a simulation.
+
+    The fields of every transaction live in NumPy columns, and a
+    Transaction is only a view on its row. The txn IDs of a node are
+    consecutive in its ID lane (see generateTransactionID), so each lane
+    is given runs of 2**LANE_RUN_BITS rows as its IDs are first stored,
+    and runs maps (lane, rank of the ID in the lane >> LANE_RUN_BITS) to
+    the first row of the run. The columns then grow with the stored
+    transactions, whatever the spread of the IDs across the lanes. They
+    grow by doubling, rounded up to whole chunks of TABLE_CHUNK rows.
+    Every transaction has the same size (txn-size), kept once for the
+    table.
+
+    Attributes:
+    - txnSize (float): Size of a transaction in a block (txn-size).
+    - lanes (int): Number of ID lanes.
+    - runs (np.ndarray[int64]): First row of each run of each lane (-1 if not handed out).
+    - numRows (int): Number of rows handed out.
+    - values (np.ndarray[float64]): Value of each transaction.
+    - senders (np.ndarray[int32]): Sender of each transaction (-1 for mining).
+    - receivers (np.ndarray[int32]): Receiver of each transaction.
+    - types (np.ndarray[int8]): Type of each transaction (0 for payment, 1 for mining).
+
+    Methods:
+    - add(txnID, val, senderPeerID, receiverPeerID, type=0): Stores a transaction.
+    - rowOf(txnID): Returns the row of a stored transaction.
+    - rows(txnIDs): Returns the rows of an array of stored transactions.
+    - view(txnID): Returns the Transaction view of a stored transaction.
+    """
+    def __init__(self, config=None):
+        self.txnSize = (config or getDefaultConfig()).txnSize
+        self.lanes = idLanes()
+        self.runs = np.full((self.lanes, 1), -1, dtype=np.int64)
+        self.numRows = 0
+        self.values = np.zeros(0, dtype=np.float64)
+        self.senders = np.zeros(0, dtype=np.int32)
+        self.receivers = np.zeros(0, dtype=np.int32)
+        self.types = np.zeros(0, dtype=np.int8)
+
+    def grow(self, numRows):
+        """
+        Resizes the columns to hold numRows rows
+        """
+        capacity = max(numRows, 2*len(self.values))
+        capacity = -(-capacity//TABLE_CHUNK)*TABLE_CHUNK
+        for name in ("values", "senders", "receivers", "types"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def newRow(self, txnID):
+        """
+        Row of a new transaction, handing a run of rows to its lane if needed
+        """
+        rank, lane = divmod(txnID, self.lanes)
+        run = rank >> LANE_RUN_BITS
+        if run >= self.runs.shape[1]:
+            runs = np.full((self.lanes, max(run+1, 2*self.runs.shape[1])), -1, dtype=np.int64)
+            runs[:, :self.runs.shape[1]] = self.runs
+            self.runs = runs
+        if self.runs[lane, run] < 0:
+            self.runs[lane, run] = self.numRows
+            self.numRows += 1 << LANE_RUN_BITS
+            if self.numRows > len(self.values):
+                self.grow(self.numRows)
+        return int(self.runs[lane, run]) + (rank & ((1 << LANE_RUN_BITS)-1))
+
+    def add(self, txnID, val, senderPeerID, receiverPeerID, type=0):
+        if txnID < 0:
+            raise ValueError("Transaction IDs must not be negative")
+        row = self.newRow(txnID)
+        self.values[row] = val
+        self.senders[row] = senderPeerID
+        self.receivers[row] = receiverPeerID
+        self.types[row] = type
+        return row
+
+    def rowOf(self, txnID):
+        rank, lane = divmod(txnID, self.lanes)
+        return int(self.runs[lane, rank >> LANE_RUN_BITS]) + (rank & ((1 << LANE_RUN_BITS)-1))
+
+    def rows(self, txnIDs):
+        rank, lane = np.divmod(txnIDs, self.lanes)
+        return self.runs[lane, rank >> LANE_RUN_BITS] + (rank & ((1 << LANE_RUN_BITS)-1))
+
+    def view(self, txnID):
+        txn = Transaction.__new__(Transaction)
+        txn.txnID = txnID
+        txn.row = self.rowOf(txnID)
+        txn.table = self
+        return txn
+
+    def row(self, txnID):
+        """
+        Return: (val, senderPeerID, receiverPeerID, type) of a transaction
+        """
+        row = self.rowOf(txnID)
+        return (float(self.values[row]), int(self.senders[row]), int(self.receivers[row]), int(self.types[row]))
 
 class Transaction:
     """
     Represents a transaction or mining operation in a peer-to-peer cryptocurrency network.
 
+    A slotted view on the row of txnID in a TransactionTable: the fields
+    are read from (and val written to) the columns of the table.
+
     Attributes:
     - txnId (int): Unique identifier for the transaction.
+    - row (int): Row of the transaction in its table.
+    - table (TransactionTable): Table holding the fields of the transaction.
     - val (float): Value associated with the transaction (e.g., amount of coins).
     - senderPeerID (int): Identifier of the peer initiating the transaction or mining (-1 for mining).
     - receiverPeerID (int): Identifier of the peer receiving the transaction.
@@ -13,23 +128,51 @@ class Transaction:
     - size (int): Size attribute for the transaction.
 
     Methods:
-    - __init__(txnID, val, senderPeerID, receiverPeerID, type=0): Initializes a Transaction object.
+    - __init__(txnID, val, senderPeerID, receiverPeerID, type=0, table=None): Stores a transaction in table and initializes its view.
     - __str__(): Returns a human-readable string representation of the transaction.
     """
-    def __init__(self, txnID, val, senderPeerID, receiverPeerID, type=0) -> None:
+    __slots__ = ("txnID", "row", "table")
+
+    def __init__(self, txnID, val, senderPeerID, receiverPeerID, type=0, table=None) -> None:
         """
         Initializes a Transaction object.
         """
         self.txnID = txnID
-        self.val = val        
-        self.senderPeerID = senderPeerID
-        self.receiverPeerID = receiverPeerID
-        self.type = type
-
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        params_path = os.path.join(script_dir,"../helper",'params.json')
-        self.size = json.load(open(params_path))['txn-size']
-        
+        self.table = table if table is not None else getDefaultTable()
+        self.row = self.table.add(txnID, val, senderPeerID, receiverPeerID, type)
+
+    @property
+    def val(self):
+        return float(self.table.values[self.row])
+
+    @val.setter
+    def val(self, val):
+        self.table.values[self.row] = val
+
+    @property
+    def senderPeerID(self):
+        return int(self.table.senders[self.row])
+
+    @property
+    def receiverPeerID(self):
+        return int(self.table.receivers[self.row])
+
+    @property
+    def type(self):
+        return int(self.table.types[self.row])
+
+    @property
+    def size(self):
+        return self.table.txnSize
+
+    def __hash__(self):
+        # By ID, as Node.__hash__
+        return self.txnID
+
+    def __eq__(self, other):
+        # Views of the same transaction are interchangeable
+        return isinstance(other, Transaction) and self.txnID == other.txnID
+
     def __str__(self) -> str:
         """
         Returns a String Representation of the Transaction object.
@@ -37,4 +180,15 @@ class Transaction:
         if(self.type==0):
             return str(self.txnID)+":"+str(self.senderPeerID)+" pays "+str(self.receiverPeerID)+" "+str(self.val)+" coins"
         if(self.type==1):
-            return str(self.txnID)+":"+str(self.receiverPeerID)+" mines "+str(self.val)+" coins"
\ No newline at end of file
+            return str(self.txnID)+":"+str(self.receiverPeerID)+" mines "+str(self.val)+" coins"
+
+defaultTable = None
+
+def getDefaultTable():
+    """
+    Table of the transactions created without one, for the default config
+    """
+    global defaultTable
+    if defaultTable is None:
+        defaultTable = TransactionTable()
+    return defaultTable
@@ -0,0 +1,79 @@
+from helper.utils import *
+from models.event import Event
+from models.transaction import Transaction
+
+# Number of arrivals drawn at once
+ARRIVAL_CHUNK = 256
+
+class TxnArrivalStream:
+    """
+    Lazily generated transaction arrivals of a node.
+
+    Transactions enter the network at each node as a Poisson process
+    with mean inter-arrival time ttx, from a sender drawn uniformly
+    among the other nodes (the superposition of the per-sender streams
+    with a uniform receiver). Inter-arrival times and senders are drawn
+    in NumPy chunks from the random stream of the node, only the next arrival of the node is in the event
+    queue and its transaction is created when the event fires.
+
+    Attributes:
+    - node (Node): Node the transactions arrive at.
+    - nodes (list[Node]): All the nodes, indexed by ID.
+    - ttx (float): Mean inter-arrival time.
+    - simTime (float): No arrival is scheduled after simTime.
+    - generated (dict<NodeID, int>): Arrivals fired so far per sender.
+
+    Methods:
+    - scheduleNext(time): Schedules the arrival following time.
+    - arrive(event): Creates the transaction of an arrival and schedules the next one.
+    """
+    def __init__(self, node, nodes, ttx, simTime):
+        self.node = node
+        self.nodes = nodes
+        self.ttx = ttx
+        self.simTime = simTime
+        self.generated = dict()
+        self.gaps = []
+        self.senders = []
+        self.position = 0
+
+    def draw(self, time):
+        """
+        Draws the next chunk of inter-arrival times and senders
+        """
+        size = ARRIVAL_CHUNK
+        if self.ttx > 0:
+            # No need for more than the expected arrivals left
+            size = max(1, min(size, int((self.simTime-time)/self.ttx)+16))
+        self.gaps = self.node.rng.exponential(self.ttx, size).tolist()
+        senders = self.node.rng.integers(0, len(self.nodes)-1, size)
+        # Shifted over the node itself
+        senders += senders >= self.node.nodeID
+        self.senders = senders.tolist()
+        self.position = 0
+
+    def scheduleNext(self, time):
+        if self.position == len(self.gaps):
+            self.draw(time)
+        t = time+self.gaps[self.position]
+        sender = self.senders[self.position]
+        self.position += 1
+        if t <= self.simTime:
+            pushToEventQueue(Event(time=t, type=0, senderPeer=self.nodes[sender], receiverPeer=self.node))
+
+    def arrive(self, event):
+        """
+        Return: Transaction of the arrival event
+        """
+        senderID = event.senderPeer.nodeID
+        self.generated[senderID] = self.generated.get(senderID, 0)+1
+        txn = Transaction(
+            txnID=generateTransactionID(self.node),
+            senderPeerID=senderID,
+            receiverPeerID=self.node.nodeID,
+            val=0,
+            type=0,
+            table=self.node.txnTable
+        )
+        self.scheduleNext(event.time)
+        return txn
@@ -0,0 +1,30 @@
+class ValidationCache:
+    """
+    Validity of the blocks, shared by all the nodes.
+
+    Blocks are immutable and every node holds the same block objects, so
+    the transactions of a block are valid for every node as soon as they
+    are valid for one: the result only depends on the block and its
+    parent. The first node receiving a block validates it, the others
+    read the memoized result.
+
+    Attributes:
+    - results (dict<(BlockID, PrevBlockID), bool>): Validity of the blocks validated so far.
+
+    Methods:
+    - validate(block, validator): Validity of block, calling validator(block) on a miss.
+    - evict(blocks): Forgets the validity of blocks (archived, never validated again).
+    """
+    def __init__(self):
+        self.results = dict()
+
+    def validate(self, block, validator):
+        key = (block.blockID, block.prevBlockID)
+        valid = self.results.get(key)
+        if valid is None:
+            valid = self.results[key] = validator(block)
+        return valid
+
+    def evict(self, blocks):
+        for block in blocks:
+            self.results.pop((block.blockID, block.prevBlockID), None)
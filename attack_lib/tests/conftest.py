@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The simulator modules import each other as top-level
+# packages (helper, models), run from the library directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
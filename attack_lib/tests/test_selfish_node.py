@@ -0,0 +1,18 @@
+from helper.utils import initialize_rand_generator
+from models.simulator import Simulator
+
+def test_global_mode_drains_after_releasing_private_chains():
+    # Seed and sizes of a run which held a lead of 3
+    # blocks with an empty private chain in the drain
+    initialize_rand_generator(42)
+    simulator = Simulator(10, 0.3, 0.3, 10, 100, 3000, miningMode="global")
+    simulator.generateNetwork()
+    simulator.generateTransaction()
+    simulator.generateBlock()
+    try:
+        simulator.simulate()
+    finally:
+        initialize_rand_generator()
+    for node in simulator.nodes[simulator.n_honest:]:
+        assert node.privateChain == []
+        assert node.state in (None, 0)
@@ -0,0 +1,59 @@
+import math
+from types import SimpleNamespace
+import pytest
+from models.stop_condition import MinerUtilizationPrecision
+
+class Chain:
+    """
+    Blockchain of a single node, enough for MainChainTracker
+    """
+    def __init__(self):
+        genesis = SimpleNamespace(blockID=1, prevBlockID=0, length=1, miner=None)
+        self.node = SimpleNamespace(blockchain=SimpleNamespace(lastBlock=genesis, rcvdBlocks={1: genesis}))
+        self.nextID = 2
+
+    def add(self, miner, parent=None):
+        """
+        Adds a block of miner on parent (the tip by default)\\n
+        Return: block event of the node
+        """
+        blockchain = self.node.blockchain
+        parent = parent or blockchain.lastBlock
+        block = SimpleNamespace(blockID=self.nextID, prevBlockID=parent.blockID, length=parent.length+1, miner=SimpleNamespace(nodeID=miner))
+        self.nextID += 1
+        blockchain.rcvdBlocks[block.blockID] = block
+        if block.length > blockchain.lastBlock.length:
+            blockchain.lastBlock = block
+        return SimpleNamespace(time=float(block.blockID), receiverPeer=self.node, block=block)
+
+def test_mpu_wilson_interval():
+    condition = MinerUtilizationPrecision([0], 0.1)
+    condition.tracker.mined[0] = 10
+    condition.tracker.onChain[0] = 7
+    mpu, halfWidth = condition.estimate(0)
+    z2 = 1.96**2
+    assert mpu == pytest.approx(0.7)
+    assert halfWidth == pytest.approx(1.96/(1+z2/10)*math.sqrt(0.7*0.3/10+z2/400))
+
+def test_mpu_stops_once_the_interval_is_narrow_enough():
+    chain = Chain()
+    condition = MinerUtilizationPrecision([0], 0.05)
+    stops = [condition.update(chain.add(0)) for _ in range(40)]
+    # Every block on the main chain: z^2/(2(n+z^2)) < 0.05 from n = 35
+    assert stops.index(True) == 34
+    assert condition.estimate(0)[0] == 1
+
+def test_mpu_does_not_stop_while_the_interval_is_wide():
+    chain = Chain()
+    condition = MinerUtilizationPrecision([0], 0.05)
+    for i in range(100):
+        parent = chain.node.blockchain.lastBlock
+        if i % 2:
+            # Miner 0 loses the tie, its block ends off the main chain
+            assert not condition.update(chain.add(1, parent))
+            assert not condition.update(chain.add(0, parent))
+            assert not condition.update(chain.add(1))
+        else:
+            assert not condition.update(chain.add(0))
+    assert condition.tracker.mined[0] == 100
+    assert condition.estimate(0)[0] == 0.5
@@ -1,41 +1,207 @@
 import os
-import heapq
 import json
+from time import perf_counter_ns
 from numpy.random import default_rng
+from helper.event_queue import EVENT_QUEUE_ENGINES
+from helper.config import getDefaultConfig
 
-script_dir = os.path.dirname(os.path.abspath(__file__))
-params_path = os.path.join(script_dir, 'params.json')
-
-randomGenerator=None
-txnID=-1
-blockID=1
+# Seeded by initialize_rand_generator, no config is read at import
+randomGenerator=default_rng()
+randomSeed=None
+# Block, txn and event IDs are interleaved over the nodes,
+# the k-th ID of the node in lane i is k*idStride+i
+idStride=1
 totalBlocks=0
-globalEventQueue=[]
+globalEventQueue=EVENT_QUEUE_ENGINES["heap"]()
+staleEvents=0
+
+# The queue is compacted once stale events are more than
+# this fraction of it (and at least the minimum count)
+STALE_COMPACT_FRACTION=0.5
+STALE_COMPACT_MIN=1024
+
+# Conservative parallel mode: partition owning each node,
+# events for nodes of other partitions go to the outbox
+partitionOwner=None
+partitionID=0
+partitionOutbox=None
+
+# Opt-in profiler timing the queue operations (helper.profiler)
+eventProfiler=None
 
 def initialize_rand_generator(seed=None):
-    global randomGenerator
-    if not seed:
-        seed = json.load(open(params_path))['default-seed']
-    randomGenerator=default_rng(seed)
-
-def generateTransactionID():
-    global txnID
-    txnID+=1
+    global randomSeed
+    if seed is None:
+        seed = getDefaultConfig().defaultSeed
+    randomSeed=seed
+    # Reseeded in place, modules hold
+    # references to it through star imports
+    randomGenerator.bit_generator.state=default_rng(seed).bit_generator.state
+
+def initialize_id_spaces(lanes):
+    """
+    Interleaves the IDs over lanes ID spaces, one per\n
+    node (and one for the network-wide mining sampler)
+    """
+    global idStride
+    idStride=lanes
+
+def idLanes():
+    """
+    Number of ID lanes (see initialize_id_spaces)
+    """
+    return idStride
+
+def nodeRandomGenerator(lane):
+    """
+    Random stream of the node in a lane, derived from\n
+    the seed and the lane only: the draws of a node do\n
+    not depend on the other nodes, nor on the process\n
+    simulating it
+    """
+    return default_rng([randomSeed, lane])
+
+def generateTransactionID(node):
+    txnID=node.txnCount*idStride+node.nodeID
+    node.txnCount+=1
     return txnID
 
-def generateBlockID():
-    global blockID
-    blockID+=1
+def generateBlockID(node):
+    # The genesis block is block 1
+    blockID=2+node.blockCount*idStride+node.nodeID
+    node.blockCount+=1
     return blockID
 
+def eventSequence(event):
+    """
+    Tiebreak of an event in the queue, the next event\n
+    ID of the node scheduling it: the sender of a\n
+    message, the receiver otherwise
+    """
+    node=event.senderPeer if event.type==1 or event.type==4 else event.receiverPeer
+    sequence=node.eventCount*idStride+node.nodeID
+    node.eventCount+=1
+    return sequence
+
+def initialize_event_queue(engine="heap"):
+    global globalEventQueue, staleEvents
+    if engine not in EVENT_QUEUE_ENGINES:
+        raise ValueError(f"Unknown event queue engine {engine}")
+    globalEventQueue=EVENT_QUEUE_ENGINES[engine]()
+    staleEvents=0
+
 def pushToEventQueue(event):
-    heapq.heappush(globalEventQueue, (event.time, event))
+    # Numbered once, messages from other partitions keep theirs
+    if event.sequence is None:
+        event.sequence=eventSequence(event)
+    if partitionOwner is not None and partitionOwner[event.receiverPeer.nodeID]!=partitionID:
+        partitionOutbox.append(event)
+        return
+    if eventProfiler is None:
+        globalEventQueue.push(event.time, event.sequence, event)
+        return
+    start=perf_counter_ns()
+    globalEventQueue.push(event.time, event.sequence, event)
+    eventProfiler.recordQueue("queuePush", perf_counter_ns()-start, eventQueueLength())
 
 def popFromEventQueue():
-    return heapq.heappop(globalEventQueue)
+    global staleEvents
+    if eventProfiler is not None:
+        start=perf_counter_ns()
+    # Stale events are discarded on pop
+    time, event = globalEventQueue.pop()
+    while isStaleEvent(event):
+        staleEvents-=1
+        time, event = globalEventQueue.pop()
+    if eventProfiler is not None:
+        eventProfiler.recordQueue("queuePop", perf_counter_ns()-start, eventQueueLength()+1)
+    return time, event
+
+def setEventProfiler(profiler):
+    """
+    Starts (or stops, with None) timing the queue operations
+    """
+    global eventProfiler
+    eventProfiler=profiler
+
+def nextEventTime():
+    """
+    Time of the next live event, inf if there is none
+    """
+    global staleEvents
+    while eventQueueLength():
+        time, event = globalEventQueue.peek()
+        if not isStaleEvent(event):
+            return time
+        globalEventQueue.pop()
+        staleEvents-=1
+    return float("inf")
+
+def eventQueueLength():
+    """
+    Number of live events in the queue
+    """
+    return len(globalEventQueue)-staleEvents
+
+def isStaleEvent(event):
+    """
+    A finish mining event is stale once its node
+    has started a newer mining process
+    """
+    return event.type==3 and event.generation!=event.receiverPeer.miningGeneration
+
+def markStaleEvent():
+    """
+    Accounts for an event made stale, and compacts
+    the queue when the stale fraction gets too high
+    """
+    global staleEvents
+    staleEvents+=1
+    if staleEvents>=STALE_COMPACT_MIN and staleEvents>STALE_COMPACT_FRACTION*len(globalEventQueue):
+        globalEventQueue.compact(lambda event: not isStaleEvent(event))
+        staleEvents=0
+
+def enterPartition(owner, partition, outbox):
+    """
+    Restricts this process to the nodes of one partition\n
+    (conservative parallel mode): keeps only their events,\n
+    the nodes bring their own random streams and IDs
+    """
+    global partitionOwner, partitionID, partitionOutbox, staleEvents
+    globalEventQueue.compact(lambda event: owner[event.receiverPeer.nodeID]==partition and not isStaleEvent(event))
+    staleEvents=0
+    partitionOwner=owner
+    partitionID=partition
+    partitionOutbox=outbox
+
+def saveGlobalState():
+    """
+    Returns the module state needed to resume a simulation:\n
+    ID spaces, event queue and the random generator state\n
+    (the nodes hold their own ID counters and streams)
+    """
+    return {
+        "idStride": idStride,
+        "totalBlocks": totalBlocks,
+        "staleEvents": staleEvents,
+        "randomSeed": randomSeed,
+        "eventQueue": globalEventQueue,
+        "numpyRandomState": randomGenerator.bit_generator.state,
+    }
+
+def restoreGlobalState(state):
+    """
+    Restores the module state saved by saveGlobalState
+    """
+    global idStride, totalBlocks, staleEvents, randomSeed, globalEventQueue
+    idStride=state["idStride"]
+    totalBlocks=state["totalBlocks"]
+    staleEvents=state["staleEvents"]
+    randomSeed=state["randomSeed"]
+    globalEventQueue=state["eventQueue"]
+    # Restored in place, modules hold references to the generator
+    randomGenerator.bit_generator.state=state["numpyRandomState"]
 
 def incrementTotalBlocks():
     global totalBlocks
     totalBlocks += 1
-
-initialize_rand_generator()
\ No newline at end of file
@@ -0,0 +1,323 @@
+import numpy as np
+from models.block_tree import BlockTree
+
+# Status bits of a block at a node
+RECEIVED = 1
+ORPHAN = 2
+INVALID = 4
+PENDING = 8
+MAIN = 16
+
+# Block rows of the columns before the first growth
+INITIAL_ROWS = 256
+
+# Chain lengths made final between two archiving passes,
+# each pass compacts the columns
+ARCHIVE_BATCH = 16
+
+class BlockStore:
+    """
+    Blocks of the simulation, each held once, and the state of every
+    block at every node.
+
+    Each registered block gets a row, and the per-node state lives in
+    dense NumPy columns indexed by (node, row): the arrival time of the
+    block at the node (NaN if not received) and a status byte of bits
+    RECEIVED (held in rcvdBlocks), ORPHAN, INVALID, PENDING and MAIN
+    (on the chain of the node's last block). The columns grow by
+    doubling. The BlockChain of a node is a view over its row of the
+    columns, so statistics over all the nodes (e.g. propagation delays)
+    are column operations. The tree of the registered blocks is indexed
+    in a BlockTree.
+
+    With an archive (setArchive), the blocks deeper than finalityDepth
+    below the last block of every node are final, once the chains of all
+    the nodes agree at that depth: they are moved with their state to the
+    BlockArchive and their rows are dropped, so the memory holds the
+    recent blocks only. The forks off the final chain (stale forks) are
+    moved with them, whatever their length, and new blocks extending an
+    archived block are rejected (see BlockChain.belowFinality). The views
+    below read the archived blocks transparently. Only the blocks are
+    bounded, the transactions (table, received sets and mempools) still
+    grow with the run.
+
+    Attributes:
+    - numNodes (int): Number of nodes.
+    - blocks (list[Block]): Registered blocks, by row.
+    - rows (dict<BlockID, int>): Row of each registered block.
+    - arrival (np.ndarray[float64]): Arrival time of each block at each node.
+    - status (np.ndarray[uint8]): Status bits of each block at each node.
+    - tree (BlockTree): Parent and skip pointers of the registered blocks.
+    - archive (BlockArchive): Archive of the final blocks, None keeps every block.
+    - finalityDepth (int): Depth below the last block of every node making a block final.
+    - finalLength (int): Chain length up to which the blocks are archived.
+    - tipLength (np.ndarray[int64]): Length of the chain of the last block of each node.
+    - tips (list[Block]): Last block of each node.
+    - validationCache (ValidationCache): Shared validity of the blocks, forgotten once archived (None if not shared).
+
+    Methods:
+    - register(block): Returns the row of a block, registering it on first use.
+    - rowsWith(nodeID, bit): Returns the rows of the blocks with a status bit at a node.
+    - setArchive(archive, finalityDepth): Archives the final blocks from now on.
+    - moveTip(nodeID, block): Records a new last block of a node, archiving final blocks.
+    - archivedRecord(blockID): Returns the archive record of a block, None if not archived.
+    - propagationDelays(): Returns the delay of every block to every node.
+    """
+    def __init__(self, numNodes):
+        self.numNodes = numNodes
+        self.blocks = []
+        self.rows = dict()
+        self.arrival = np.full((numNodes, INITIAL_ROWS), np.nan)
+        self.status = np.zeros((numNodes, INITIAL_ROWS), dtype=np.uint8)
+        self.tree = BlockTree(self)
+        self.archive = None
+        self.finalityDepth = 0
+        self.finalLength = 0
+        self.tipLength = np.zeros(numNodes, dtype=np.int64)
+        self.tips = [None]*numNodes
+        self.validationCache = None
+
+    def register(self, block):
+        row = self.rows.get(block.blockID)
+        if row is None:
+            row = self.rows[block.blockID] = len(self.blocks)
+            self.blocks.append(block)
+            if row == self.arrival.shape[1]:
+                self.grow()
+            self.tree.add(row)
+        return row
+
+    def grow(self):
+        rows = self.arrival.shape[1]
+        arrival = np.full((self.numNodes, 2*rows), np.nan)
+        arrival[:, :rows] = self.arrival
+        status = np.zeros((self.numNodes, 2*rows), dtype=np.uint8)
+        status[:, :rows] = self.status
+        self.arrival, self.status = arrival, status
+
+    def rowsWith(self, nodeID, bit):
+        return np.flatnonzero(self.status[nodeID, :len(self.blocks)] & bit)
+
+    def setArchive(self, archive, finalityDepth):
+        if finalityDepth < 1:
+            raise ValueError("The finality depth must be at least 1")
+        self.archive = archive
+        self.finalityDepth = finalityDepth
+
+    def moveTip(self, nodeID, block):
+        self.tipLength[nodeID] = block.length
+        self.tips[nodeID] = block
+        if self.archive is None:
+            return
+        finalLength = int(self.tipLength.min())-self.finalityDepth
+        if finalLength < self.finalLength+ARCHIVE_BATCH:
+            return
+        # The chains of the nodes must agree up to the
+        # final length, or it waits for their fork
+        agreed = None
+        for tip in {tip.blockID: tip for tip in self.tips}.values():
+            agreed = tip if agreed is None else self.tree.commonAncestor(agreed, tip)
+            # Forks at the last final block
+            if agreed.blockID not in self.rows:
+                return
+        finalLength = min(finalLength, agreed.length)
+        if finalLength >= self.finalLength+ARCHIVE_BATCH:
+            self.archiveFinal(finalLength, self.tree.ancestor(agreed, finalLength))
+
+    def archiveFinal(self, finalLength, finalBlock):
+        """
+        Moves the blocks up to finalLength, and the\n
+        forks off the chain of finalBlock (the final\n
+        block at finalLength), to the archive and\n
+        compacts the rows of the others
+        """
+        count = len(self.blocks)
+        lengths = np.fromiter((block.length for block in self.blocks), dtype=np.int64, count=count)
+        final = lengths <= finalLength
+        finalRow = self.rows[finalBlock.blockID]
+        for row in np.flatnonzero(~final).tolist():
+            if self.tree.linked[row] and not self.onFinalChain(row, finalLength, finalRow):
+                final[row] = True
+        self.finalLength = finalLength
+        if not final.any():
+            return
+        finalRows = np.flatnonzero(final)
+        keep = np.flatnonzero(~final)
+        archived = [self.blocks[row] for row in finalRows.tolist()]
+        self.archive.append(archived, self.arrival[:, finalRows].T, self.status[:, finalRows].T)
+
+        for row in finalRows.tolist():
+            del self.rows[self.blocks[row].blockID]
+        self.blocks = [self.blocks[row] for row in keep.tolist()]
+        for row, block in enumerate(self.blocks):
+            self.rows[block.blockID] = row
+        arrival = np.full(self.arrival.shape, np.nan)
+        arrival[:, :len(keep)] = self.arrival[:, keep]
+        status = np.zeros(self.status.shape, dtype=np.uint8)
+        status[:, :len(keep)] = self.status[:, keep]
+        self.arrival, self.status = arrival, status
+
+        # New row of each old row, -1 for the archived ones
+        newRows = np.full(count, -1, dtype=np.int64)
+        newRows[keep] = np.arange(len(keep))
+        self.tree.compact(newRows)
+        if self.validationCache is not None:
+            self.validationCache.evict(archived)
+
+    def onFinalChain(self, row, finalLength, finalRow):
+        """
+        Does the (linked) block at row, longer than\n
+        finalLength, descend from the final block\n
+        """
+        try:
+            return self.tree.ancestorRow(row, finalLength) == finalRow
+        except ValueError:
+            # Its branch already left the archived chain
+            return False
+
+    def archivedRecord(self, blockID):
+        if self.archive is None:
+            return None
+        return self.archive.record(blockID)
+
+    def propagationDelays(self):
+        """
+        Time from the first arrival of each block\n
+        to its arrival at each node, archived blocks\n
+        included\n
+        Return: np.ndarray (nodes x blocks), NaN if not received
+        """
+        arrival = self.arrival[:, :len(self.blocks)]
+        if self.archive is not None and len(self.archive):
+            arrival = np.concatenate((self.archive.records()["arrival"].T, arrival), axis=1)
+        return arrival-np.nanmin(arrival, axis=0)
+
+class ReceivedBlocks:
+    """
+    Dict-like view of the blocks held by a node (BlockID -> Block),
+    iterated in arrival order
+    """
+    __slots__ = ("store", "nodeID")
+
+    def __init__(self, store, nodeID):
+        self.store = store
+        self.nodeID = nodeID
+
+    def __contains__(self, blockID):
+        row = self.store.rows.get(blockID)
+        if row is None:
+            record = self.store.archivedRecord(blockID)
+            return record is not None and record["status"][self.nodeID] & RECEIVED != 0
+        return self.store.status[self.nodeID, row] & RECEIVED != 0
+
+    def __getitem__(self, blockID):
+        if blockID not in self:
+            raise KeyError(blockID)
+        row = self.store.rows.get(blockID)
+        if row is None:
+            return self.store.archive.block(blockID)
+        return self.store.blocks[row]
+
+    def __setitem__(self, blockID, block):
+        # Registering may grow (replace) the columns
+        row = self.store.register(block)
+        self.store.status[self.nodeID, row] |= RECEIVED
+
+    def __delitem__(self, blockID):
+        if blockID not in self:
+            raise KeyError(blockID)
+        self.store.status[self.nodeID, self.store.rows[blockID]] &= 0xFF ^ RECEIVED
+
+    def __iter__(self):
+        rows = self.store.rowsWith(self.nodeID, RECEIVED)
+        blockIDs = np.array([self.store.blocks[row].blockID for row in rows.tolist()], dtype=np.int64)
+        arrival = self.store.arrival[self.nodeID, rows]
+        if self.store.archive is not None:
+            records = self.store.archive.records()
+            received = records["status"][:, self.nodeID] & RECEIVED != 0
+            blockIDs = np.concatenate((records["blockID"][received], blockIDs))
+            arrival = np.concatenate((records["arrival"][received, self.nodeID], arrival))
+        # Ties on time in ID order, whatever the row order
+        return iter(blockIDs[np.lexsort((blockIDs, arrival))].tolist())
+
+    def __len__(self):
+        return len(self.store.rowsWith(self.nodeID, RECEIVED))+archivedCount(self.store, self.nodeID, RECEIVED)
+
+class ArrivalTimes:
+    """
+    Dict-like view of the arrival time of the blocks at a node
+    (BlockID -> Time), for registered blocks
+    """
+    __slots__ = ("store", "nodeID")
+
+    def __init__(self, store, nodeID):
+        self.store = store
+        self.nodeID = nodeID
+
+    def __contains__(self, blockID):
+        row = self.store.rows.get(blockID)
+        if row is None:
+            record = self.store.archivedRecord(blockID)
+            return record is not None and not np.isnan(record["arrival"][self.nodeID])
+        return not np.isnan(self.store.arrival[self.nodeID, row])
+
+    def __getitem__(self, blockID):
+        if blockID not in self:
+            raise KeyError(blockID)
+        row = self.store.rows.get(blockID)
+        if row is None:
+            return float(self.store.archivedRecord(blockID)["arrival"][self.nodeID])
+        return float(self.store.arrival[self.nodeID, row])
+
+    def __setitem__(self, blockID, time):
+        self.store.arrival[self.nodeID, self.store.rows[blockID]] = time
+
+class StatusSet:
+    """
+    Set-like view of the IDs of the blocks having
+    a status bit at a node, iterated in row order
+    """
+    __slots__ = ("store", "nodeID", "bit")
+
+    def __init__(self, store, nodeID, bit):
+        self.store = store
+        self.nodeID = nodeID
+        self.bit = bit
+
+    def __contains__(self, blockID):
+        row = self.store.rows.get(blockID)
+        if row is None:
+            record = self.store.archivedRecord(blockID)
+            return record is not None and record["status"][self.nodeID] & self.bit != 0
+        return self.store.status[self.nodeID, row] & self.bit != 0
+
+    def add(self, blockID):
+        self.store.status[self.nodeID, self.store.rows[blockID]] |= self.bit
+
+    def discard(self, blockID):
+        row = self.store.rows.get(blockID)
+        if row is not None:
+            self.store.status[self.nodeID, row] &= 0xFF ^ self.bit
+
+    def remove(self, blockID):
+        if blockID not in self:
+            raise KeyError(blockID)
+        self.discard(blockID)
+
+    def __iter__(self):
+        blockIDs = [self.store.blocks[row].blockID for row in self.store.rowsWith(self.nodeID, self.bit).tolist()]
+        if self.store.archive is not None:
+            records = self.store.archive.records()
+            blockIDs = records["blockID"][records["status"][:, self.nodeID] & self.bit != 0].tolist()+blockIDs
+        return iter(blockIDs)
+
+    def __len__(self):
+        return len(self.store.rowsWith(self.nodeID, self.bit))+archivedCount(self.store, self.nodeID, self.bit)
+
+def archivedCount(store, nodeID, bit):
+    """
+    Number of archived blocks with a status bit at a node
+    """
+    if store.archive is None:
+        return 0
+    return int(np.count_nonzero(store.archive.records()["status"][:, nodeID] & bit))
@@ -0,0 +1,159 @@
+def skipLength(length):
+    """
+    Chain length of the block the skip pointer of a\n
+    block of this length points to (the skip heights\n
+    of Bitcoin's block index, on lengths)
+    """
+    height = length-1
+    if height < 2:
+        return 1
+    if height & 1:
+        height -= 1
+        height &= height-1
+        return (height & (height-1))+2
+    return (height & (height-1))+1
+
+class BlockTree:
+    """
+    Index of the tree of the blocks of a BlockStore.
+
+    Each block row links to its parent row and to one ancestor further
+    back (its skip pointer), at lengths chosen so that any ancestor of a
+    block is reached in O(log n) jumps. The rows of a block are linked
+    when the block is registered, a block registered before its parent
+    (e.g. in a partition) waits for it. Ancestors, the common ancestor
+    of two blocks and the depth of a reorganization are then queries on
+    the tree, instead of walks over prevBlockID. The common ancestor
+    takes O(log n + d) steps, d the depth of the fork: once the skip
+    pointers of the two branches agree, they are stepped back a parent
+    at a time. Rows archived by the store are unlinked (compact),
+    queries stay above the final blocks.
+
+    Attributes:
+    - store (BlockStore): Store of the blocks.
+    - parent (list[int]): Row of the parent of each row (-1 for the root, unlinked or archived).
+    - skip (list[int]): Row of the skip ancestor of each row (-1 if none).
+    - linked (list[bool]): Is each row linked to its parent.
+    - waiting (dict<BlockID, list[int]>): Rows registered before their parent.
+
+    Methods:
+    - add(row): Links a registered row, and the rows waiting for it.
+    - compact(newRows): Renumbers the rows after the store dropped some.
+    - ancestor(block, length): Returns the ancestor of block at a chain length.
+    - commonAncestor(a, b): Returns the last common ancestor of two blocks.
+    - reorgDepth(oldTip, newTip): Number of blocks a tip move disconnects.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.parent = []
+        self.skip = []
+        self.linked = []
+        self.waiting = dict()
+
+    def add(self, row):
+        self.parent.append(-1)
+        self.skip.append(-1)
+        self.linked.append(False)
+        block = self.store.blocks[row]
+        if block.length == 1:
+            self.linked[row] = True
+        else:
+            parentRow = self.store.rows.get(block.prevBlockID)
+            if parentRow is None or not self.linked[parentRow]:
+                self.waiting.setdefault(block.prevBlockID, []).append(row)
+                return
+            self.link(row, parentRow)
+
+        # Rows of the children registered before this block
+        linked = [row]
+        while linked:
+            blockID = self.store.blocks[linked.pop()].blockID
+            for child in self.waiting.pop(blockID, []):
+                self.link(child, self.store.rows[blockID])
+                linked.append(child)
+
+    def link(self, row, parentRow):
+        self.parent[row] = parentRow
+        self.linked[row] = True
+        length = skipLength(self.store.blocks[row].length)
+        # No skip pointer to the archived blocks
+        if length > self.store.finalLength:
+            self.skip[row] = self.ancestorRow(parentRow, length)
+
+    def ancestorRow(self, row, length):
+        """
+        Row of the ancestor at a chain length of\n
+        the (linked) block at row, in O(log n)
+        """
+        blocks = self.store.blocks
+        walk = blocks[row].length
+        if length > walk or length < 1:
+            raise ValueError(f"No ancestor of length {length}")
+        while walk > length:
+            skip = skipLength(walk)
+            skipPrev = skipLength(walk-1)
+            # Take the skip pointer unless the parent's
+            # one gets closer to the target
+            if self.skip[row] != -1 and (skip == length or (skip > length and not (skipPrev < skip-2 and skipPrev >= length))):
+                row = self.skip[row]
+                walk = skip
+            else:
+                row = self.parent[row]
+                walk -= 1
+            if row == -1:
+                raise ValueError(f"Ancestor of length {length} is archived")
+        return row
+
+    def ancestor(self, block, length):
+        return self.store.blocks[self.ancestorRow(self.store.rows[block.blockID], length)]
+
+    def commonAncestor(self, a, b):
+        """
+        Last common ancestor of the blocks a and b,\n
+        by skip jumps while the branches differ, then\n
+        parent steps, in O(log n + d) for a fork d\n
+        blocks below the shorter of them\n
+        Return: Block (ArchivedBlock if they fork at\n
+        the last final block)
+        """
+        length = min(a.length, b.length)
+        rowA = self.ancestorRow(self.store.rows[a.blockID], length)
+        rowB = self.ancestorRow(self.store.rows[b.blockID], length)
+        # Rows of the same length have skips of the same length
+        while rowA != rowB:
+            if self.skip[rowA] != self.skip[rowB] and -1 not in (self.skip[rowA], self.skip[rowB]):
+                rowA, rowB = self.skip[rowA], self.skip[rowB]
+            elif -1 in (self.parent[rowA], self.parent[rowB]):
+                # Branches off the same final block, the
+                # last archived one of the chain
+                prevBlockID = self.store.blocks[rowA].prevBlockID
+                if self.store.archive is None or prevBlockID != self.store.blocks[rowB].prevBlockID:
+                    raise ValueError("Fork below the finality depth, the common ancestor is archived")
+                return self.store.archive.block(prevBlockID)
+            else:
+                rowA, rowB = self.parent[rowA], self.parent[rowB]
+        return self.store.blocks[rowA]
+
+    def compact(self, newRows):
+        """
+        newRows (np.ndarray): New row of each row, -1 if dropped
+        """
+        newRows = newRows.tolist()
+        kept = [row for row, newRow in enumerate(newRows) if newRow != -1]
+        self.parent = [newRows[self.parent[row]] if self.parent[row] != -1 else -1 for row in kept]
+        self.skip = [newRows[self.skip[row]] if self.skip[row] != -1 else -1 for row in kept]
+        self.linked = [self.linked[row] for row in kept]
+        waiting = dict()
+        for blockID, rows in self.waiting.items():
+            rows = [newRows[row] for row in rows if newRows[row] != -1]
+            if rows:
+                waiting[blockID] = rows
+        self.waiting = waiting
+
+    def reorgDepth(self, oldTip, newTip):
+        """
+        Blocks of the chain of oldTip that are not\n
+        in the chain of newTip, in O(log n + depth)\n
+        Return: int (0 if newTip extends oldTip)
+        """
+        return oldTip.length-self.commonAncestor(oldTip, newTip).length
@@ -1,36 +1,64 @@
+import numpy as np
 from models.block import Block
+from models.txn_bitset import TXN_STORES
+from models.block_store import BlockStore, ReceivedBlocks, ArrivalTimes, StatusSet, ORPHAN, INVALID, PENDING, MAIN
 class BlockChain:
     """
     Represents blockchain in a peer-to-peer network.
 
+    The blocks and their per-node state live in a BlockStore shared by
+    all the nodes, the block collections below are views over the
+    columns of this node.
+
     Attributes:
-    - rcvdTxns (dict<TxnID, Txn>): Map of all the received Transactions.
-    - rcvdBlocks (dict<BlockID, Block>): Map of all the received Blocks.
-    - rcvdBlocksTime (dict<BlockID, Time>): Map of the block IDs with time.
-    - pendingBlocks (set(BlockID)): Map of all the block IDs which has not yet been processed.
-    - orphanBlocks (set(BlockID)): Map of all the block IDs whose parent is not yet been in the chain.
-    - invalidBlocks (set(BlockID)): Map of all the block IDs which has invalid txns.
+    - rcvdTxns (set[Txn] | TxnBitset): Set of all the received Transactions (see TXN_STORES).
+    - store (BlockStore): Blocks and per-node block state.
+    - nodeID (int): Node of this blockchain in the store.
+    - rcvdBlocks (ReceivedBlocks): Map of all the received Blocks.
+    - rcvdBlocksTime (ArrivalTimes): Map of the block IDs with time.
+    - pendingBlocks (StatusSet): Map of all the block IDs which has not yet been processed.
+    - orphanBlocks (StatusSet): Map of all the block IDs whose parent is not yet been in the chain.
+    - orphansByParent (dict<BlockID, list[BlockID]>): Orphan blocks waiting for each parent.
+    - invalidBlocks (StatusSet): Map of all the block IDs which has invalid txns.
+    - mainChain (StatusSet): Map of the block IDs on the chain ending at the last block.
     - lastBlock (Block): Reference to the last block.
+    - longestReorg (int): Most blocks disconnected by a single move of the last block.
 
     Methods:
-    - __init__(): Initializes a Blockchain Object.
+    - __init__(txnStore="set", store=None, nodeID=0): Initializes a Blockchain Object.
     - addGenesisBlock(genesisBlock): Adds the genensis block to the blockchain.
+    - addOrphan(block): Adds an orphan block, waiting for its parent.
+    - releaseOrphans(blockID): Removes and returns the orphans waiting for a block.
+    - setTip(block): Moves the last block, updating the main chain.
+    - belowFinality(block): Checks if a block forks off an archived (final) block.
+    - dropFork(blockID): Releases the orphans waiting for a block below finality.
+    - moveTo(store): Copies the state of this node to another store and views it.
     - __str__(): Returns a human-readable string representation of blockchain.
     """
-    def __init__(self):
+    def __init__(self, txnStore="set", store=None, nodeID=0):
         """
         Initializes a Blockchain Object.
         """
-        self.rcvdTxns = set()
-
-        self.rcvdBlocks = dict()
-        self.rcvdBlocksTime = dict()
+        if txnStore not in TXN_STORES:
+            raise ValueError(f"Unknown transaction store {txnStore}")
+        self.rcvdTxns = TXN_STORES[txnStore]()
 
-        self.pendingBlocks = set()
-        self.orphanBlocks = set()
-        self.invalidBlocks = set()
+        self.nodeID = nodeID
+        self.bindStore(store if store is not None else BlockStore(nodeID+1))
+        self.orphansByParent = dict()
 
         self.lastBlock: Block=None
+        self.longestReorg = 0
+
+    def bindStore(self, store):
+        self.store = store
+        self.rcvdBlocks = ReceivedBlocks(store, self.nodeID)
+        self.rcvdBlocksTime = ArrivalTimes(store, self.nodeID)
+
+        self.pendingBlocks = StatusSet(store, self.nodeID, PENDING)
+        self.orphanBlocks = StatusSet(store, self.nodeID, ORPHAN)
+        self.invalidBlocks = StatusSet(store, self.nodeID, INVALID)
+        self.mainChain = StatusSet(store, self.nodeID, MAIN)
 
     def addGenesisBlock(self,genesisBlock):
         """
@@ -39,6 +67,80 @@ class BlockChain:
         self.rcvdBlocks[genesisBlock.blockID]=genesisBlock
         self.rcvdBlocksTime[genesisBlock.blockID]=0
         self.lastBlock=genesisBlock
+        self.mainChain.add(genesisBlock.blockID)
+
+    def addOrphan(self, block):
+        self.orphanBlocks.add(block.blockID)
+        self.orphansByParent.setdefault(block.prevBlockID, []).append(block.blockID)
+
+    def releaseOrphans(self, blockID):
+        children = self.orphansByParent.pop(blockID, [])
+        for child in children:
+            self.orphanBlocks.discard(child)
+        return children
+
+    def setTip(self, block):
+        """
+        Moves the last block to block, the main chain\n
+        markers change only between the fork point\n
+        and the two tips
+        """
+        tree = self.store.tree
+        fork = tree.commonAncestor(self.lastBlock, block)
+        self.longestReorg = max(self.longestReorg, self.lastBlock.length-fork.length)
+        # An archived fork block has no row, the walks
+        # stop above it
+        forkRow = self.store.rows.get(fork.blockID, -1)
+        status = self.store.status[self.nodeID]
+        row = self.store.rows[self.lastBlock.blockID]
+        while row != forkRow:
+            status[row] &= 0xFF ^ MAIN
+            row = tree.parent[row]
+        row = self.store.rows[block.blockID]
+        while row != forkRow:
+            status[row] |= MAIN
+            row = tree.parent[row]
+        self.lastBlock = block
+        self.store.moveTip(self.nodeID, block)
+
+    def belowFinality(self, block):
+        """
+        Does block fork off the archived (final)\n
+        chain, its parent being final or archived\n
+        with a stale fork
+        """
+        return self.store.archive is not None and (block.length-1 <= self.store.finalLength or self.store.archivedRecord(block.prevBlockID) is not None)
+
+    def dropFork(self, blockID):
+        """
+        Releases the orphans waiting, recursively, for\n
+        a block below finality which is dropped\n
+        Return: list of the registered orphans (the\n
+        archived ones keep their archived state)
+        """
+        registered = []
+        waiting = [blockID]
+        while waiting:
+            for child in self.releaseOrphans(waiting.pop()):
+                if child in self.store.rows:
+                    registered.append(child)
+                else:
+                    waiting.append(child)
+        return registered
+
+    def moveTo(self, store):
+        """
+        Copies the state of the blocks at this node to\n
+        store, registering them there, and views store
+        """
+        old = self.store
+        status = old.status[self.nodeID, :len(old.blocks)]
+        arrival = old.arrival[self.nodeID, :len(old.blocks)]
+        for row in np.flatnonzero(status | ~np.isnan(arrival)).tolist():
+            newRow = store.register(old.blocks[row])
+            store.status[self.nodeID, newRow] = status[row]
+            store.arrival[self.nodeID, newRow] = arrival[row]
+        self.bindStore(store)
 
     def __str__(self):
         res=[]
@@ -0,0 +1,75 @@
+import os
+import gzip
+import pickle
+from helper.utils import *
+
+class CheckpointPickler(pickle.Pickler):
+    """
+    Pickles nodes as references to their IDs, so the peer graph
+    is not walked recursively, node states are stored separately
+    """
+    def __init__(self, file, nodes):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.nodeTypes = tuple({type(node) for node in nodes})
+
+    def persistent_id(self, obj):
+        if isinstance(obj, self.nodeTypes):
+            return obj.nodeID
+        return None
+
+class CheckpointUnpickler(pickle.Unpickler):
+    """
+    Resolves node references to the given node objects
+    """
+    def __init__(self, file, nodes):
+        super().__init__(file)
+        self.nodes = nodes
+
+    def persistent_load(self, pid):
+        return self.nodes[pid]
+
+def saveNodeState(node):
+    """
+    Node state to pickle, peers are stored in ID\n
+    order to rebuild sets iterating like the originals
+    """
+    state = dict(node.__dict__)
+    state["neighbors"] = sorted(node.neighbors, key=lambda peer: peer.nodeID)
+    return state
+
+def saveCheckpoint(simulator, path):
+    """
+    Writes the full simulation state to path:\n
+    simulator, nodes (blockchains, selfish state),\n
+    event queue, ID counters and the random generator state.\n
+    Format: gzip stream of two pickles, the node classes\n
+    and then the state, written atomically
+    """
+    tempPath = path+".tmp"
+    with gzip.open(tempPath, "wb", compresslevel=1) as f:
+        pickle.dump([type(node) for node in simulator.nodes], f, pickle.HIGHEST_PROTOCOL)
+        CheckpointPickler(f, simulator.nodes).dump({
+            "simulator": simulator,
+            "nodeStates": [saveNodeState(node) for node in simulator.nodes],
+            "globals": saveGlobalState(),
+        })
+    os.replace(tempPath, path)
+
+def loadCheckpoint(path):
+    """
+    Restores a simulation saved by saveCheckpoint\n
+    Return: Simulator
+    """
+    with gzip.open(path, "rb") as f:
+        nodes = []
+        for nodeID, cls in enumerate(pickle.load(f)):
+            # Nodes are hashed by ID while the state is loaded
+            node = cls.__new__(cls)
+            node.nodeID = nodeID
+            nodes.append(node)
+        state = CheckpointUnpickler(f, nodes).load()
+    for node, nodeState in zip(nodes, state["nodeStates"]):
+        nodeState["neighbors"] = set(nodeState["neighbors"])
+        node.__dict__.update(nodeState)
+    restoreGlobalState(state["globals"])
+    return state["simulator"]
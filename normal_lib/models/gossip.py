@@ -0,0 +1,118 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from helper.utils import *
+from models.event import Event
+
+class PathGossip:
+    """
+    Shortest-path propagation engine for transactions.
+
+    Under flooding, each node forwards a transaction once, on its first
+    arrival, to all its peers, over links with a freshly sampled latency.
+    The first arrival at every node is then the shortest path from the
+    source over the sampled link latencies. Instead of one event per
+    link, the latencies of all the links are sampled at once (same
+    distribution as calculateLatency) and a single Dijkstra run gives
+    the arrival times, only the first arrival at each node is scheduled.
+
+    A node rejecting the transaction on balance does not forward it: the
+    arrival times are then recomputed without its outgoing links, and
+    the nodes reached through it are rescheduled (their older arrival
+    events become stale). Unlike flooding, a node which rejected the
+    transaction does not check later copies of it again.
+
+    Attributes:
+    - nodes (list[Node]): All the nodes, indexed by ID.
+    - indptr, peers (np.ndarray): Peer graph in CSR form.
+    - baseLatency (np.ndarray): Propagation plus transmission delay of each directed link.
+    - queuingMean (np.ndarray): Mean queuing delay of each directed link.
+    - pending (dict<TxnID, dict>): Propagation state of the transactions in flight.
+
+    Methods:
+    - spread(node, txn, time): Schedules the arrivals of a transaction generated at node.
+    - isLive(event): False for arrivals superseded by a rejection.
+    - accept(event): Accounts for an accepted arrival.
+    - reject(event): Reroutes around a node rejecting the transaction.
+    """
+    def __init__(self, nodes, config):
+        self.nodes = nodes
+        indptr = [0]
+        peers = []
+        lowSpeed = []
+        for node in nodes:
+            for peer in sorted(node.neighbors, key=lambda peer: peer.nodeID):
+                peers.append(peer.nodeID)
+                lowSpeed.append(node.lowSpeed or peer.lowSpeed)
+            indptr.append(len(peers))
+        self.indptr = np.array(indptr, dtype=np.int32)
+        self.peers = np.array(peers, dtype=np.int32)
+        sources = np.repeat(np.arange(len(nodes)), np.diff(self.indptr))
+
+        # Same terms as calculateLatency, in seconds
+        c = np.where(lowSpeed, config.lowLinkSpeed, config.highLinkSpeed)
+        self.baseLatency = nodes[0].latencyMatrix[sources, self.peers]/1000+config.transactionSizeKB*1000*8/c
+        self.queuingMean = config.queuingDelayMean/c
+        self.pending = dict()
+
+    def shortestPaths(self, state):
+        """
+        Arrival delays from the source and predecessors,\n
+        rejecting nodes do not forward the transaction
+        """
+        latency = state["latency"]
+        if state["rejected"]:
+            latency = latency.copy()
+            for nodeID in state["rejected"]:
+                latency[self.indptr[nodeID]:self.indptr[nodeID+1]] = np.inf
+        graph = csr_matrix((latency, self.peers, self.indptr), shape=(len(self.nodes), len(self.nodes)))
+        return dijkstra(graph, indices=state["source"], return_predecessors=True)
+
+    def schedule(self, state, nodeIDs):
+        """
+        Pushes the arrival events of the given nodes
+        """
+        for nodeID in nodeIDs:
+            pushToEventQueue(Event(
+                time=state["time"]+state["delay"][nodeID],
+                type=1,
+                txn=state["txn"],
+                senderPeer=self.nodes[state["pred"][nodeID]],
+                receiverPeer=self.nodes[nodeID],
+            ))
+
+    def spread(self, node, txn, time):
+        latency = self.baseLatency+node.rng.exponential(1, len(self.peers))*self.queuingMean
+        state = {"txn": txn, "source": node.nodeID, "time": time, "latency": latency, "rejected": set()}
+        state["delay"], state["pred"] = self.shortestPaths(state)
+        reached = np.flatnonzero(np.isfinite(state["delay"]))
+        reached = reached[reached != node.nodeID].tolist()
+        state["waiting"] = len(reached)
+        if reached:
+            self.pending[txn.txnID] = state
+            self.schedule(state, reached)
+
+    def isLive(self, event):
+        state = self.pending.get(event.txn.txnID)
+        return state is not None and state["time"]+state["delay"][event.receiverPeer.nodeID] == event.time
+
+    def done(self, state):
+        state["waiting"] -= 1
+        if state["waiting"] == 0:
+            del self.pending[state["txn"].txnID]
+
+    def accept(self, event):
+        self.done(self.pending[event.txn.txnID])
+
+    def reject(self, event):
+        state = self.pending[event.txn.txnID]
+        state["rejected"].add(event.receiverPeer.nodeID)
+        oldDelay = state["delay"]
+        state["delay"], state["pred"] = self.shortestPaths(state)
+        # Only the nodes reached through the rejecting one
+        # change, and they are all reached later than now
+        changed = np.flatnonzero((state["delay"] != oldDelay) & (state["time"]+oldDelay > event.time))
+        lost = np.count_nonzero(np.isinf(state["delay"][changed]))
+        self.schedule(state, changed[np.isfinite(state["delay"][changed])].tolist())
+        state["waiting"] -= lost
+        self.done(state)
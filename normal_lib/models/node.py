@@ -1,15 +1,14 @@
 import sys
 sys.path.append("../helper")
 from helper.utils import *
-from models.event import Event
-from models.transaction import Transaction
-from models.block import Block
+from helper.config import getDefaultConfig
+from models.event import Event, buildDispatchTable
+from models.transaction import Transaction, TransactionTable
+from models.block import Block, VECTORIZE_MIN_TXNS, balanceDeltas
 from models.blockchain import BlockChain
-import json
-import random
-
-script_dir = os.path.dirname(os.path.abspath(__file__))
-params_path = os.path.join(script_dir, "../helper", "params.json")
+from models.mempool import Mempool
+import math
+import numpy as np
 
 class Node:
     def __init__(
@@ -19,7 +18,11 @@ class Node:
         mineTime,
         lowSpeed=False,
         lowCPU=False,
-        latencyMatrix=None
+        latencyMatrix=None,
+        config=None,
+        txnStore="set",
+        txnTable=None,
+        blockStore=None
     ):
         self.nodeID = nodeID
         self.lowSpeed = lowSpeed
@@ -27,11 +30,44 @@ class Node:
         self.mineTime = mineTime
 
         self.neighbors = set()
-        self.blockchain = BlockChain()
+        self.blockchain = BlockChain(txnStore, blockStore, nodeID)
         self.latencyMatrix = latencyMatrix
+        self.config = config or getDefaultConfig()
+        # Columns of the transactions, shared by all the nodes
+        self.txnTable = txnTable if txnTable is not None else TransactionTable(self.config)
+        self.mempool = Mempool(genesisBlock)
+        # Transaction arrivals, started by the simulator
+        self.txnStream = None
+        # Shortest-path transaction propagation, None floods
+        self.gossip = None
+        # Synthetic block fill, set in block-only mode
+        self.blockFill = None
+        # Block validity shared by all the nodes, None validates every block
+        self.validationCache = None
+
+        # A node runs a single mining process at a time,
+        # finish events of older generations are stale
+        self.miningGeneration = 0
+        self.miningActive = False
+        self.miningStartPending = False
+        # Set when the simulator samples block discoveries network-wide
+        self.networkMining = False
+
+        # Random stream and ID counters of this node, its draws
+        # and IDs do not depend on the process simulating it
+        self.rng = nodeRandomGenerator(nodeID)
+        self.txnCount = 0
+        self.blockCount = 0
+        self.eventCount = 0
 
         self.addGenesisBlock(genesisBlock)
 
+    def __hash__(self):
+        # Hashing by ID keeps the iteration order of peer sets (and
+        # of txn sets, see Transaction.__hash__) reproducible across
+        # processes and restored checkpoints
+        return self.nodeID
+
     def addGenesisBlock(self, genesisBlock):
         """
         Adds the Genesis Block
@@ -46,24 +82,20 @@ class Node:
         Return: float (seconds)
         """
         if(self.lowSpeed or peer.lowSpeed):
-            lowLinkSpeedMbps = json.load(open(params_path))["low-link-speed-Mbps"]
-            # Converting to bps
-            c = lowLinkSpeedMbps*(10**6)
+            # Link speed in bps
+            c = self.config.lowLinkSpeed
         else:
-            highLinkSpeedMbps = json.load(open(params_path))["high-link-speed-Mbps"]
-            # Converting to bps
-            c = highLinkSpeedMbps*(10**6)
-
-        queuingDelayMean=json.load(open(params_path))["queuing-delay-mean-Kb"]
-        # Converting to Kb to bits
-        queuingDelayMean=queuingDelayMean*1000
-        d = randomGenerator.exponential(queuingDelayMean/c)
+            # Link speed in bps
+            c = self.config.highLinkSpeed
+
+        # Queuing delay mean in bits
+        d = self.rng.exponential(self.config.queuingDelayMean/c)
         
         # Convert size KB to bits
         size = size*1000*8
 
         # Convert propagation speed to sec
-        propagationSpeed=self.latencyMatrix[self.nodeID][peer.nodeID]/1000
+        propagationSpeed=self.latencyMatrix[self.nodeID, peer.nodeID]/1000
         transmissionSpeed=size/c
 
         return propagationSpeed + transmissionSpeed + d
@@ -73,10 +105,10 @@ class Node:
         Returns a Mining TXN
         """
         # Get new tranasaction ID
-        txnID = generateTransactionID()
+        txnID = generateTransactionID(self)
 
         # Get the mining value
-        miningValue = json.load(open(params_path))["mining-fee"]
+        miningValue = self.config.miningFee
 
         # Prepare the mining TXN and add it to included txn list
         miningTxn = Transaction(
@@ -85,6 +117,7 @@ class Node:
             receiverPeerID=self.nodeID,
             val=miningValue,
             type=1,
+            table=self.txnTable,
         )
         return miningTxn
 
@@ -92,9 +125,12 @@ class Node:
         """
         Broadcast TXN to Neighbours
         """
+        if self.gossip is not None:
+            self.gossip.spread(self, txn, time)
+            return
         for peer in self.neighbors:
             # Calculate Latency
-            latency = self.calculateLatency(peer, size=json.load(open(params_path))["transaction-size-KB"])
+            latency = self.calculateLatency(peer, size=self.config.transactionSizeKB)
             # Push flooding event to the event queue
             pushToEventQueue(
                 Event(
@@ -128,146 +164,184 @@ class Node:
     def checkValidTxnsInBlock(self, block: Block):
         """
         Check if the Transaction 
-        inside the BLocks are valid
+        inside the BLocks are valid,
+        once per block with a validation cache
         """
-        # Get the previous block balance
-        prevBlock: Block = self.blockchain.rcvdBlocks[block.prevBlockID]
-        prevBlockBalance = list(prevBlock.balance)
+        if self.validationCache is not None:
+            return self.validationCache.validate(block, self.validateTxnsInBlock)
+        return self.validateTxnsInBlock(block)
 
-        # Get the current balance
-        currentBalance = list(block.balance)
+    def validateTxnsInBlock(self, block: Block):
+        """
+        Validates the transactions of a block
+        against the balance of its parent
+        """
+        prevBlock: Block = self.blockchain.rcvdBlocks[block.prevBlockID]
+        if len(block.txnIDs) >= VECTORIZE_MIN_TXNS:
+            return self.validateTxnsVectorized(block, prevBlock)
 
-        # Add/Subtract the transaction from the previous balance
-        # Expected to get the current balance
+        # Net balance change of each node touched by the
+        # transactions, the others keep the previous balance
+        deltas = dict()
         for txn in block.txnList:
-            if txn.type == 1:
-                prevBlockBalance[txn.receiverPeerID]+=txn.val
-                continue
-            prevBlockBalance[txn.receiverPeerID]+=txn.val
-            prevBlockBalance[txn.senderPeerID]-=txn.val
-        # Check if the current balance is same as expected
-        for i in range(len(prevBlockBalance)):
-            if prevBlockBalance[i]!=currentBalance[i] or currentBalance[i]<0:
-                return False        
+            if txn.type == 0:
+                deltas[txn.senderPeerID] = deltas.get(txn.senderPeerID, 0)-txn.val
+            deltas[txn.receiverPeerID] = deltas.get(txn.receiverPeerID, 0)+txn.val
+        if deltas.keys() != block.deltas.keys():
+            return False
+        # Check if the current balance is same as expected,
+        # up to rounding (the sum order follows the txn set order,
+        # which differs between copies of a block)
+        for nodeID, delta in deltas.items():
+            balance = block.balance[nodeID]
+            if not math.isclose(prevBlock.balance[nodeID]+delta,balance,rel_tol=1e-9,abs_tol=1e-9) or balance<0:
+                return False
         return True
 
+    def validateTxnsVectorized(self, block: Block, prevBlock: Block):
+        """
+        NumPy path of validateTxnsInBlock, for large
+        blocks: the transfers are summed per node over
+        the txn table columns, and the balances are
+        compared and checked in one vector operation
+        """
+        nodes, changes = balanceDeltas(block.txnIDs, self.txnTable)
+        nodes = nodes.tolist()
+        if block.deltas.keys() != set(nodes):
+            return False
+        expected = np.array(prevBlock.balance.take(nodes))+changes
+        balance = np.array(block.balance.take(nodes))
+        return bool(np.isclose(expected,balance,rtol=1e-9,atol=1e-9).all() and (balance>=0).all())
+
     def validateAndForward(self, block: Block, time):
         """
         Validate and forward Block to the N/W
         """
+        # Forks off the archived (final) blocks are
+        # dropped, with the orphans waiting for them
+        if self.blockchain.belowFinality(block):
+            for childID in self.blockchain.dropFork(block.blockID):
+                self.invalidateBlock(childID)
+            return
+
         # Add the block to the blockchain
         self.blockchain.rcvdBlocks[block.blockID]=block
         self.blockchain.rcvdBlocksTime[block.blockID]=time
 
+        # Descendants of an invalid block are invalid
+        if block.prevBlockID in self.blockchain.invalidBlocks:
+            self.invalidateBlock(block.blockID)
+            return
+
         # Check if blockchain is in received blocks or block parent is an orphan
         if (block.prevBlockID not in self.blockchain.rcvdBlocks) or (block.prevBlockID in self.blockchain.orphanBlocks):
-            self.blockchain.orphanBlocks.add(block.blockID)
+            self.blockchain.addOrphan(block)
             return
         
         # Check if txns inside the block are valid
         if not self.checkValidTxnsInBlock(block):
-            self.blockchain.invalidBlocks.add(block.blockID)
-            del self.blockchain.rcvdBlocks[block.blockID]
+            self.invalidateBlock(block.blockID)
             return
 
         # Check if the block is making a longer chain
         if self.blockchain.lastBlock.length<block.length:
             self.updateLongestChain(block)
-            event=Event(time=time,type=2,receiverPeer=self)
-            pushToEventQueue(event)
+            self.scheduleMining(time)
 
         # Flood block to the other nodes
         self.floodBlock(block,time)
 
         # After adding the block in chain,
         # Process orphan blocks
-        self.processOrphanBlocks(time)
-
-    def processOrphanBlocks(self, time):
-        """
-        Process Blocks which didn't have parent
-        """
-        # List for storing all orphans
-        deleteOrphan=[]
-        for blockID in self.blockchain.orphanBlocks:
-            block: Block = self.blockchain.rcvdBlocks[blockID]
-            # Check if parent of the orphan block is invalid
-            if block.prevBlockID in self.blockchain.invalidBlocks:
-                # Add the orphan block to invalid block
-                self.blockchain.invalidBlocks.add(block.blockID)
-                del self.blockchain.rcvdBlocks[block.blockID]
-                deleteOrphan.append(block.blockID)
-                continue
+        self.processOrphanBlocks(block, time)
 
-            # If block is still orphan
-            if block.prevBlockID not in self.blockchain.rcvdBlocks or block.prevBlockID in self.blockchain.orphanBlocks:
-                continue
-            
-            # Not an orphan
-            # Then orphan is not an orphan now
-            deleteOrphan.append(block.blockID)
-
-            # Check the txns if txn is valid
-            if not self.checkValidTxnsInBlock(block):
-                # Add the block to invalid block
-                self.blockchain.invalidBlocks.add(block.blockID)
-                del self.blockchain.rcvdBlocks[block.blockID]
-                continue
-            # Check if it's increasing the length
-            if self.blockchain.lastBlock.length<block.length:
-                # Update the longest chain
-                self.updateLongestChain(block)
-
-                # Start a mining event
-                event=Event(time=time,type=2,receiverPeer=self)
-                pushToEventQueue(event)
-            
-            # Flood the block to the network
-            self.floodBlock(block, time)
-
-        # Remove the orphan blocks
-        for blockID in deleteOrphan:
-            self.blockchain.orphanBlocks.remove(blockID)
+    def processOrphanBlocks(self, block, time):
+        """
+        Process the orphan blocks waiting for block,\n
+        and recursively the orphans waiting for them
+        """
+        # Blocks whose waiting children are released
+        connected=[block.blockID]
+        while connected:
+            for childID in self.blockchain.releaseOrphans(connected.pop()):
+                child: Block = self.blockchain.rcvdBlocks[childID]
+                # Check the txns if txn is valid
+                if not self.checkValidTxnsInBlock(child):
+                    self.invalidateBlock(childID)
+                    continue
+                # Check if it's increasing the length
+                if self.blockchain.lastBlock.length<child.length:
+                    # Update the longest chain
+                    self.updateLongestChain(child)
+
+                    # Start a mining event
+                    self.scheduleMining(time)
+
+                # Flood the block to the network
+                self.floodBlock(child, time)
+
+                # Its own orphans can connect now
+                connected.append(childID)
+
+    def invalidateBlock(self, blockID):
+        """
+        Marks a block and the orphans waiting\n
+        for it, recursively, as invalid
+        """
+        invalid=[blockID]
+        while invalid:
+            blockID=invalid.pop()
+            self.blockchain.invalidBlocks.add(blockID)
+            if blockID in self.blockchain.rcvdBlocks:
+                del self.blockchain.rcvdBlocks[blockID]
+            invalid.extend(self.blockchain.releaseOrphans(blockID))
+
+    def scheduleMining(self, time):
+        """
+        Schedules a (re)start of the mining process,
+        at most one start event is pending at a time
+        """
+        if self.miningStartPending or self.networkMining:
+            return
+        self.miningStartPending = True
+        pushToEventQueue(Event(time=time,type=2,receiverPeer=self))
 
     def updateLongestChain(self, block: Block):
         """
         Updates longest chain
         """
-        self.blockchain.lastBlock=block
+        self.blockchain.setTip(block)
 
     def eventHandler(self, event):
         """
         Redirects event to 
         required functions
         """
-        if event.type == 0:
-            self.generateTXN(event)
-        elif event.type == 1:
-            self.receiveTXN(event)
-        elif event.type == 2:
-            self.mineBlock(event)
-        elif event.type == 3:
-            self.finishMine(event)
-        elif event.type == 4:
-            self.receiveBlock(event)
-        else:
+        try:
+            handler = self.dispatchTable[event.type]
+        except IndexError:
             raise ValueError(f"Event Type not Valid")
+        handler(self, event)
 
     # Event - 0
     def generateTXN(self, event: Event):
         """
         Generates a Transaction and propagates to all it's peers
         """
+        # The transaction of an arrival is created when it fires
+        if event.txn is None:
+            event.txn = self.txnStream.arrive(event)
         # Get the last balance of this node
         selfBalance = self.blockchain.lastBlock.balance[event.txn.senderPeerID]
         # Check if the balance satisfying the least condition
         if selfBalance <= 0:
             return
         # Randomly generate a txn value
-        event.txn.val = randomGenerator.uniform(0, selfBalance/10+1)
+        event.txn.val = self.rng.uniform(0, selfBalance/10+1)
         
         # Add it to received txn
         self.blockchain.rcvdTxns.add(event.txn)
+        self.mempool.add(event.txn)
         # Propagate the txn to all it's peers
         self.floodTxn(event.txn,event.time)
 
@@ -277,65 +351,106 @@ class Node:
         Receive Transaction Generated by other Peers
         and Propagates to all it's peers
         """
+        # Arrivals rerouted by the path gossip are dropped
+        if self.gossip is not None and not self.gossip.isLive(event):
+            return
         # Check if the transaction is already received
         if event.txn in self.blockchain.rcvdTxns:
             return
         if self.blockchain.lastBlock.balance[event.txn.senderPeerID]<event.txn.val:
+            if self.gossip is not None:
+                self.gossip.reject(event)
             return
         
         # Add it to received txn
         self.blockchain.rcvdTxns.add(event.txn)
+        self.mempool.add(event.txn)
 
-        # Propagate the transaction to it's peers
-        self.floodTxn(event.txn, event.time)
+        # Propagate the transaction to it's peers, the path
+        # gossip already scheduled the arrivals at every node
+        if self.gossip is None:
+            self.floodTxn(event.txn, event.time)
+        else:
+            self.gossip.accept(event)
 
     # Event - 2
     def mineBlock(self, event: Event):
         """
-        Mines a New Block using a 
-        subset of transactions from 
-        pending txn pool
+        Starts mining a New Block, superseding
+        the running mining process
         """
         t=event.time
+
+        # Supersede the running mining process, if any
+        self.miningStartPending = False
+        self.miningGeneration += 1
+        if self.miningActive:
+            markStaleEvent()
+        self.miningActive = True
+
+        # Prepare the block on top of the current tip
+        block = self.prepareBlock()
+
+        # Add the latency for the block propagation to it's peers
+        t += self.rng.exponential(self.mineTime)
+        # Add to the event queue with type = 3
+        pushToEventQueue(Event(time=t, type=3, block=block, receiverPeer=self, generation=self.miningGeneration))
+
+    def prepareBlock(self):
+        """
+        Builds the block to be mined on top
+        of the current tip, using a subset of
+        transactions from pending txn pool
+        """
         lastBlock: Block = self.blockchain.lastBlock
 
         # Get coinbase txn
         coinbaseTxn = self.getCoinbaseTxn()
+
+        # Block-only mode: the coinbase and the
+        # size of a synthetic set of transactions
+        if self.blockFill is not None:
+            return Block(
+                blockID=generateBlockID(self),
+                prevBlockID=lastBlock.blockID,
+                prevLengthOfChain=lastBlock.length,
+                txnList={coinbaseTxn},
+                miner=self,
+                prevBlockBalance=lastBlock.balance,
+                prevIncludedTxns=lastBlock.includedTxns,
+                syntheticSize=self.blockFill.draw(self.rng)*self.config.txnSize,
+            )
         
-        # Get the remaining TXN
-        txnsAlreadyInChain=set()
-
-        # Traverse from the last block to genesis block
-        # to get the set of txn included in the chain
-        temp=lastBlock
-        while temp.blockID!=1:
-            txnsAlreadyInChain=txnsAlreadyInChain.union(lastBlock.txnList)
-            temp=self.blockchain.rcvdBlocks[temp.prevBlockID]
-        
-        # Get the remaining txn by subtracting the txns already in chain
-        pendingTxns = self.blockchain.rcvdTxns - txnsAlreadyInChain
+        # Get the remaining TXN, the mempool only visits
+        # the blocks connected or disconnected since its last sync
+        self.mempool.syncTo(lastBlock, self.blockchain.rcvdBlocks, self.blockchain.rcvdTxns)
+        pendingTxns = self.mempool.pending
 
         # Get the maximum block size
-        blockSize = json.load(open(params_path))["block-size-KB"]
+        blockSize = self.config.blockSizeKB
 
         # Randomly choose number of transaction, but ensure
         # it is does not exceed the blocksize-1
         # Why -1? 1 for the mining TXN
         numOfTxn = len(pendingTxns)
         if numOfTxn > 1:
-            numOfTxn = min(random.randint(1, len(pendingTxns)), blockSize - 1)
+            numOfTxn = min(int(self.rng.integers(1, len(pendingTxns)+1)), blockSize - 1)
 
-        # Get the current balance
-        currentBalance = list(lastBlock.balance)
+        # Current balance of the nodes touched so far,
+        # the others still have the balance of the last block
+        currentBalance = dict()
         txnToBeIncluded = set()
 
         # Choose the transaction to be included
-        for txn in pendingTxns:
+        for txn in pendingTxns.values():
+            sender = txn.senderPeerID
+            receiver = txn.receiverPeerID
+            senderBalance = currentBalance.get(sender, lastBlock.balance[sender])
             # Check if the sender has enough balance
-            if currentBalance[txn.senderPeerID]-txn.val<0:
+            if senderBalance-txn.val<0:
                 continue
-            currentBalance[txn.senderPeerID]-=txn.val
-            currentBalance[txn.receiverPeerID]+=txn.val
+            currentBalance[sender] = senderBalance-txn.val
+            currentBalance[receiver] = currentBalance.get(receiver, lastBlock.balance[receiver])+txn.val
             txnToBeIncluded.add(txn)
             # Check if we have included enough txn
             if len(txnToBeIncluded)==numOfTxn:
@@ -343,10 +458,9 @@ class Node:
 
         # Add the coinbase txn
         txnToBeIncluded.add(coinbaseTxn)
-        currentBalance[coinbaseTxn.receiverPeerID]+=coinbaseTxn.val
 
         # Get new block ID
-        blockID = generateBlockID()
+        blockID = generateBlockID(self)
 
         # Prepare a block with the transaction chosen
         block = Block(
@@ -355,13 +469,22 @@ class Node:
             prevLengthOfChain=lastBlock.length,
             txnList=txnToBeIncluded,
             miner=self,
-            prevBlockBalance=list(lastBlock.balance),\
+            prevBlockBalance=lastBlock.balance,
+            prevIncludedTxns=lastBlock.includedTxns,
         )
 
-        # Add the latency for the block propagation to it's peers
-        t += randomGenerator.exponential(self.mineTime)
-        # Add to the event queue with type = 3
-        pushToEventQueue(Event(time=t, type=3, block=block, receiverPeer=self))
+        return block
+
+    def blockFound(self, time):
+        """
+        Network-wide mining mode: this node won
+        the block discovery sampled at time\n
+        Return: The finish mining event handled
+        """
+        block = self.prepareBlock()
+        event = Event(time=time, type=3, block=block, receiverPeer=self, generation=self.miningGeneration)
+        self.finishMine(event)
+        return event
 
     # Event - 3
     def finishMine(self, event: Event):
@@ -371,13 +494,14 @@ class Node:
         Update longest chain if needed
         """
         block: Block=event.block
+        self.miningActive = False
         # Check if the longest chain has changed
         if(self.blockchain.lastBlock.blockID==block.prevBlockID):
             self.validateAndForward(block,event.time)
 
-        # Start mining again
-        event=Event(time=event.time,type=2,receiverPeer=self)
-        pushToEventQueue(event)
+        # Start mining again (no-op if the new
+        # tip has already scheduled a restart)
+        self.scheduleMining(event.time)
 
     # Event - 4
     def receiveBlock(self, event: Event):
@@ -390,3 +514,5 @@ class Node:
         if block.blockID in self.blockchain.rcvdBlocks:
             return
         self.validateAndForward(block,event.time)
+
+Node.dispatchTable = buildDispatchTable(Node)
@@ -2,31 +2,75 @@ import sys
 sys.path.append("../helper")
 sys.path.append("../outputs")
 from helper.utils import *
-from models.event import Event
-from models.transaction import Transaction
+from models.transaction import TransactionTable
 from models.block import Block
+from models.block_store import BlockStore
+from models.block_archive import BlockArchive
+from models.topology import randomPeerGraph, LinkLatencies
 from models.node import Node
-import random
+from models.mining_sampler import MiningSampler
+from models.txn_stream import TxnArrivalStream
+from models.gossip import PathGossip
+from models.block_fill import BlockFill
+from models.validation_cache import ValidationCache
+from models.parallel import simulateConservative
+from models.checkpoint import saveCheckpoint
+from helper.trace import TraceWriter
+from helper.profiler import EventProfiler
+from helper.config import getDefaultConfig
+from models.event import EVENT_HANDLERS
+import io
+import numpy as np
 import networkx as nx
 import matplotlib.pyplot as plt
 import pandas as pd
 
+# Larger networks are not drawn by saveNetworkGraph
+MAX_DRAWN_NODES = 1000
+
 class Simulator:
-    def __init__(self, n, ttx, z0, z1, I,simTime):
+    def __init__(self, n, ttx, z0, z1, I,simTime,queueEngine="heap",miningMode="node",partitions=1, config=None, txnStore="set", txnPropagation="flood", blockOnly=False, blockFillSamples=None, revalidate=False):
         """
-        Initializor for Simulator
+        Initializor for Simulator\n
+        config (Config): Simulation parameters, params.json by default\n
+        txnStore (str): Backend of the received transactions of the nodes\n
+        txnPropagation (str): Transactions flooded hop by hop (flood)\n
+        or scheduled along shortest paths (path, see PathGossip)\n
+        blockOnly (bool): No transaction traffic, blocks get a synthetic\n
+        size drawn from blockFillSamples or the default fill (see BlockFill)\n
+        revalidate (bool): Every node validates every block it receives,\n
+        instead of sharing the validity of each block (see ValidationCache)
         """
 
         if n<0 or ttx<0 or z0<0 or z0>1 or z1<0 or z1>1 or I<0 or simTime<0:
             raise ValueError("Invalid Parameters")
 
+        if miningMode not in ("node", "global"):
+            raise ValueError("Invalid Mining Mode")
+        if partitions<1 or (partitions>1 and miningMode!="node"):
+            raise ValueError("Parallel simulation needs at least one partition and node mining mode")
+        if txnPropagation not in ("flood", "path"):
+            raise ValueError("Invalid Transaction Propagation")
+        if partitions>1 and txnPropagation!="flood":
+            raise ValueError("Path gossip is not supported in parallel simulation")
+
         print("Preparing Simulator ..")
+
+        # Parameters, loaded once and shared with the nodes
+        self.config=config or getDefaultConfig()
+        print(f"Parameters:\n{self.config}\n")
+
+        # Event queue backend
+        initialize_event_queue(queueEngine)
         
         # Number of nodes
         self.n=n
 
-        # Getting starting balance from json
-        startingBalance = json.load(open(params_path))["starting-balance"]
+        # One ID lane per node, and one for the mining sampler
+        initialize_id_spaces(self.n+1)
+
+        # Getting starting balance from the config
+        startingBalance = self.config.startingBalance
         
         # Genesis block creation
         self.genesis = Block(blockID=1, prevBlockID=0, txnList=set(), prevLengthOfChain=0, miner=None, prevBlockBalance = [startingBalance]*self.n)
@@ -37,23 +81,30 @@ class Simulator:
         randomGenerator.shuffle(lowSpeed)
         randomGenerator.shuffle(lowCPU)
 
-        # Calculating hashing power
-        self.lowHashPower=1/(10*self.n-9*int(z1*self.n))
-        self.highHashPower=10*self.lowHashPower
+        # Calculating hashing power, high CPU nodes have
+        # hashing-power-factor times the power of low ones
+        factor = self.config.hashingPowerFactor
+        self.lowHashPower=1/(factor*self.n-(factor-1)*int(z1*self.n))
+        self.highHashPower=factor*self.lowHashPower
 
         # Calculating mine time
         mineTime=[I/self.lowHashPower if lowCPU[i] else I/self.highHashPower for i in range(self.n)]
 
 
-        # Latency matrix of all the nodes
-        low = json.load(open(params_path))["low-propagation-(ms)"]
-        high = json.load(open(params_path))["high-propagation-(ms)"]
-        self.latencyMatrix = randomGenerator.uniform(low,high,[self.n,self.n])
+        # Latencies of the links, drawn with the network
+        low = self.config.lowPropagationMs
+        high = self.config.highPropagationMs
+        self.latencyMatrix = LinkLatencies(low,high)
+
+        # Columns of all the transactions, shared by the nodes
+        self.txnTable = TransactionTable(self.config)
+        # Blocks and their state at every node, shared by the nodes
+        self.blockStore = BlockStore(self.n)
 
         # Creation of nodes
         self.nodes = [None]*self.n
         for i in range(self.n):
-            self.nodes[i] = Node(nodeID=i, lowSpeed=lowSpeed[i], lowCPU=lowCPU[i], mineTime=mineTime[i],genesisBlock=self.genesis,latencyMatrix=self.latencyMatrix)
+            self.nodes[i] = Node(nodeID=i, lowSpeed=lowSpeed[i], lowCPU=lowCPU[i], mineTime=mineTime[i],genesisBlock=self.genesis,latencyMatrix=self.latencyMatrix,config=self.config,txnStore=txnStore,txnTable=self.txnTable,blockStore=self.blockStore)
 
         totalHashingPower=0
         for node in self.nodes:
@@ -64,6 +115,40 @@ class Simulator:
         self.ttx = ttx
         self.I = I
         self.simTime=simTime
+        self.miningMode=miningMode
+        self.queueEngine=queueEngine
+        self.partitions=partitions
+        self.txnPropagation=txnPropagation
+        self.blockOnly=blockOnly
+        if blockOnly:
+            # A block takes half of the pool on average, in steady
+            # state the pool holds the arrivals of two block intervals
+            meanPending=2*len(self.nodes)*I/ttx if ttx>0 else float("inf")
+            blockFill=BlockFill(meanPending,self.config.blockSizeKB,blockFillSamples)
+            for node in self.nodes:
+                node.blockFill=blockFill
+        self.revalidate=revalidate
+        if not revalidate:
+            validationCache=ValidationCache()
+            for node in self.nodes:
+                node.validationCache=validationCache
+
+        # Simulated time reached, and periodic checkpoints (off by default)
+        self.time=0
+        self.checkpointPath=None
+        self.checkpointInterval=0
+        self.nextCheckpoint=float("inf")
+
+        # Binary event trace (off by default)
+        self.tracePath=None
+        self.trace=None
+
+        # Per event type profiling (off by default)
+        self.profiler=None
+        self.profilePath=None
+
+        # Goal-based stop conditions, checked on block events
+        self.stopConditions=[]
         print("Simulator Prepared\n")
 
     def generateNetwork(self):
@@ -72,97 +157,221 @@ class Simulator:
         N specified at init
         """
         print("Generating Graph ..")
-        while True:
-            self.G = nx.Graph()
-            self.G.add_nodes_from(range(self.n))
-            for node in self.nodes:
-                node.neighbors = set()
-            for node in range(self.n):
-                # Number of peers = l (Should be between 3 and 6)
-                l = randomGenerator.integers(3, 7)
-                nums=list(range(self.n))
-                random.shuffle(nums)
-                # Select peer but make sure no. of edges does not exceed 6S
-                for peer in nums:
-                    if peer!=node and len(self.nodes[peer].neighbors)<6 and len(self.nodes[node].neighbors)<l \
-                        and peer not in self.nodes[node].neighbors and node not in self.nodes[peer].neighbors:
-                        self.G.add_edge(node, peer)
-                        self.nodes[node].neighbors.add(self.nodes[peer])
-                        self.nodes[peer].neighbors.add(self.nodes[node])
-            # If graph created is connected break
-            if nx.is_connected(self.G):
-                break
+        # Connected by construction, in O(N·degree)
+        self.peerGraph = randomPeerGraph(self.n, randomGenerator)
+        self.latencyMatrix.draw(self.peerGraph, randomGenerator)
+        # Peer sets are filled in ID order, so their iteration
+        # order is the same again after a checkpoint is restored
+        for node in self.nodes:
+            node.neighbors = {self.nodes[peer] for peer in self.peerGraph.neighbors(node.nodeID)}
         print("Graph Generated\n")
 
     def generateTransaction(self):
         """
-        Generate event with transaction timestamps 
-        for each node
+        Start the transaction arrival stream\n
+        of each node, arrivals are drawn lazily\n
+        while the simulation runs
         """
+        if self.blockOnly:
+            print("Block-only Mode, No Transaction Generated\n")
+            return
         print("Generating Transaction Timestamps ..")
-        self.txnEventCounter=[]
-        for p in self.nodes:
-            # Transaction gen time
-            t = randomGenerator.exponential(self.ttx)
-            totalTxnEventCount=0
-            while(t<=self.simTime):
-                # Receiver node should be random
-                randomNode=self.nodes[randomGenerator.integers(0, len(self.nodes))]
-                while(randomNode.nodeID==p.nodeID):
-                    randomNode=self.nodes[randomGenerator.integers(0, len(self.nodes))]
-                # Create transaction and event
-                eventTXN = Transaction(
-                    txnID= generateTransactionID(),
-                    senderPeerID=p.nodeID,
-                    receiverPeerID = randomNode.nodeID,
-                    val=0,
-                    type=0
-                )
-                event=Event(time=t,type=0,senderPeer=p,receiverPeer=randomNode,txn=eventTXN)
-                pushToEventQueue(event=event)
-                totalTxnEventCount+=1
-
-                # Add time for next transaction
-                t+=randomGenerator.exponential(self.ttx)
-            self.txnEventCounter.append(totalTxnEventCount)
+        if self.txnPropagation=="path":
+            gossip=PathGossip(self.nodes,self.config)
+            for p in self.nodes:
+                p.gossip=gossip
+        # A transaction needs a sender other than its receiver
+        if len(self.nodes)>1:
+            for p in self.nodes:
+                p.txnStream=TxnArrivalStream(p,self.nodes,self.ttx,self.simTime)
+                p.txnStream.scheduleNext(0)
         print("Transaction Timestamps Generated\n")
 
+    def countTxnEvents(self):
+        """
+        Return: Transaction events fired so far per sender node
+        """
+        counts=[0]*len(self.nodes)
+        for node in self.nodes:
+            if node.txnStream is not None:
+                for senderID, count in node.txnStream.generated.items():
+                    counts[senderID]+=count
+        return counts
+
     def generateBlock(self):
         """
-        Generate first mining event for each node
+        Generate first mining event for each node,\n
+        or the first network-wide block discovery\n
+        in global mining mode
         """
         print("Generating First Mining Timestamp for each Node ..")
-        t=0
-        for p in self.nodes:
-            event=Event(time=t,type=2,receiverPeer=p)
-            pushToEventQueue(event)
-            t+=1
+        if self.miningMode=="global":
+            for p in self.nodes:
+                p.networkMining=True
+            self.miningSampler=MiningSampler(self.nodes)
+            self.miningSampler.scheduleNext(0)
+        else:
+            t=0
+            for p in self.nodes:
+                p.scheduleMining(t)
+                t+=1
         print("Mining Timestamps Generated\n")
 
+    def setCheckpoint(self, path, interval):
+        """
+        Save a checkpoint to path every interval\n
+        seconds of simulated time
+        """
+        if self.partitions>1:
+            raise ValueError("Checkpoints are not supported in parallel simulation")
+        self.checkpointPath=path
+        self.checkpointInterval=interval
+        self.nextCheckpoint=(self.time//interval+1)*interval
+
+    def setArchive(self, path, finalityDepth):
+        """
+        Move the blocks deeper than finalityDepth below\n
+        the last block of every node to the on-disk\n
+        archive at path (see BlockArchive)
+        """
+        if self.partitions>1:
+            raise ValueError("The block archive is not supported in parallel simulation")
+        self.blockStore.setArchive(BlockArchive(path, self.n, self.nodes, self.txnTable), finalityDepth)
+        # Archived blocks are never validated again
+        self.blockStore.validationCache=self.nodes[0].validationCache
+
+    def writeCheckpoint(self, time):
+        """
+        Save a checkpoint of the simulation at time
+        """
+        self.time=time
+        self.nextCheckpoint=(time//self.checkpointInterval+1)*self.checkpointInterval
+        saveCheckpoint(self, self.checkpointPath)
+        print("Checkpoint saved at time",time)
+
+    def setTrace(self, path):
+        """
+        Record every processed event to the binary\n
+        trace file at path, parallel simulations\n
+        write one file per partition (path.k). A\n
+        resumed simulation already tracing to path\n
+        appends to the records of the checkpoint
+        """
+        if self.trace is not None and self.trace.path==path:
+            return
+        self.tracePath=path
+        if self.partitions==1:
+            self.trace=TraceWriter(path)
+
+    def setProfiler(self, path=None):
+        """
+        Profile the event handlers and the event queue,\n
+        the report is printed and written as JSON to path
+        """
+        if self.partitions>1:
+            raise ValueError("Profiling is not supported in parallel simulation")
+        self.profiler=EventProfiler(EVENT_HANDLERS+("blockFound",))
+        self.profilePath=path
+
+    def addStopCondition(self, condition):
+        """
+        Stop the simulation (before simTime) once\n
+        the goal of the condition is reached
+        """
+        if self.partitions>1:
+            raise ValueError("Stop conditions are not supported in parallel simulation")
+        self.stopConditions.append(condition)
+
+    def goalReached(self, event):
+        """
+        Updates the stop conditions with a block event\n
+        Return: True if one of them is reached
+        """
+        reached=[condition for condition in self.stopConditions if condition.update(event)]
+        for condition in reached:
+            print("Stop condition reached at time",event.time,":",condition)
+        return len(reached)>0
+
+    def blockEvent(self, event):
+        """
+        Block event of a processed event for the stop conditions,\n
+        a block discovery stands for the finish mining of its winner\n
+        Return: None if the event is not about a block
+        """
+        if event.type == 5:
+            return self.miningSampler.lastFound
+        if event.type == 3 or event.type == 4:
+            return event
+        return None
+
+    def processEvent(self, time, event):
+        """
+        Dispatches and traces an event
+        """
+        if self.profiler is None:
+            event.receiverPeer.eventHandler(event)
+        else:
+            self.profiler.handle(time, event)
+        # Recorded once handled, arrivals get their txn when they fire
+        if self.trace is not None:
+            self.trace.record(time, event)
+
     def simulate(self):
         """
         Start simulation
         """
         print("Event Simulator Started ..")
-        time = 0
-        while(time<=self.simTime and globalEventQueue):
+        if self.partitions>1:
+            simulateConservative(self, self.partitions)
+            print("Event Simulator Finished\n")
+            return
+
+        if self.profiler is not None:
+            setEventProfiler(self.profiler)
+            self.profiler.install({type(node) for node in self.nodes})
+
+        # Resumed simulations start from the checkpoint time,
+        # only block events are processed after simTime
+        while(eventQueueLength() and nextEventTime()<=self.simTime):
             time, event = popFromEventQueue()
-            event.receiverPeer.eventHandler(event)
+            self.processEvent(time, event)
+            if time>=self.nextCheckpoint:
+                self.writeCheckpoint(time)
+            blockEvent = self.blockEvent(event) if self.stopConditions else None
+            if blockEvent is not None and self.goalReached(blockEvent):
+                break
             
-        while(globalEventQueue):
+        if self.profiler is not None:
+            self.profiler.startDrain()
+        while(eventQueueLength()):
             time, event = popFromEventQueue()
             if event.type == 3 or event.type == 4:
-                event.receiverPeer.eventHandler(event)
+                self.processEvent(time, event)
+        if self.trace is not None:
+            self.trace.close()
+        if self.blockStore.archive is not None:
+            self.blockStore.archive.flush()
         print("Event Simulator Finished\n")
 
+        if self.profiler is not None:
+            self.profiler.uninstall()
+            setEventProfiler(None)
+            self.profiler.printSummary()
+            if self.profilePath:
+                self.profiler.dump(self.profilePath)
+
     def saveNetworkGraph(self): 
         """
-        Save the network graph generated
+        Save the network graph generated,\n
+        unless it has too many nodes to draw
         """
+        if self.n>MAX_DRAWN_NODES:
+            print("Graph not drawn, more than",MAX_DRAWN_NODES,"nodes\n")
+            return
         output_dir = os.path.dirname(os.path.abspath(__file__))
         outputs_path = os.path.join(output_dir, "../outputs", "graph.png")
         plt.figure()
-        nx.draw(self.G, with_labels=True)
+        nx.draw(self.peerGraph.toNetworkX(), with_labels=True)
         plt.savefig(outputs_path)
         print("Graph figure saved in outputs/graph.png\n")
 
@@ -242,8 +451,10 @@ class Simulator:
         """
         totalBlocksInLongestChain=0
         blockMinedByNodeInChain=0
-        block = node.blockchain.lastBlock
-        while(True):
+        # Blocks marked on the main chain, from the last block back
+        chain = [node.blockchain.rcvdBlocks[blockID] for blockID in node.blockchain.mainChain]
+        chain.sort(key=lambda block: -block.length)
+        for block in chain:
             f.write("Block ID:"+str(block.blockID)+","+"Previous Block ID:"+str(block.prevBlockID)+",")
             totalBlocksInLongestChain+=1
             if(block.miner==None):
@@ -255,34 +466,56 @@ class Simulator:
             f.write(","+"Number of TXNs:"+str(len(block.txnList))+",")
             f.write("Time:"+str(node.blockchain.rcvdBlocksTime[block.blockID]))
             f.write("\n")
-            if block.blockID==1:
-                break
-            block = node.blockchain.rcvdBlocks[block.prevBlockID]
         f.write("\n")
         return totalBlocksInLongestChain,blockMinedByNodeInChain
 
+    def writeNodeLog(self, f, node, txnEvents):
+        """
+        Writes the log of the node specified\n
+        in the file specified
+        """
+        f.write(f"Hashing Power - {self.I/node.mineTime}\n")
+        if node.lowSpeed:
+            f.write(f"Speed - Low\n")
+        else:
+            f.write(f"Speed - High\n")
+        f.write("\n")
+        f.write("Total Transaction Event:"+str(txnEvents)+"\n")
+        f.write("\n")
+        f.write("**Blocks in the Blockchain**\n")
+        totalBlocks,blockMined=self.writeBlockChain(f,node)
+        f.write("**Blocks in the Longest Chain**\n")
+        totalBlocksInLongestChain,blockMinedByNodeInChain=self.writeLongestChain(f,node)                
+        f.write("Total Blocks in the Chain:"+str(totalBlocks)+"\n")
+        f.write("Total Blocks in the Longest Chain:"+str(totalBlocksInLongestChain)+"\n")
+        f.write("Longest Reorganization:"+str(node.blockchain.longestReorg)+"\n")
+        f.write("\n")
+        f.write(f"Blocks Mined - {blockMined}\n")
+        f.write(f"Blocks Mined in the Longest Chain - {blockMinedByNodeInChain}\n")
+
+    def nodeLogs(self):
+        """
+        Return: Log of every node, as generateStats writes it
+        """
+        txnEventCounter=self.countTxnEvents()
+        logs=[]
+        for node in self.nodes:
+            f=io.StringIO()
+            self.writeNodeLog(f,node,txnEventCounter[node.nodeID])
+            logs.append(f.getvalue())
+        return logs
+
     def generateStats(self):
         print("Generating Stats ..")
+        txnEventCounter=self.countTxnEvents()
         for node in self.nodes:
             output_dir = os.path.dirname(os.path.abspath(__file__))
             outputs_path = os.path.join(output_dir, "../outputs", f"log_node({node.nodeID}).txt")
             f=open(outputs_path,"w")
-            f.write(f"Hashing Power - {self.I/node.mineTime}\n")
-            if node.lowSpeed:
-                f.write(f"Speed - Low\n")
-            else:
-                f.write(f"Speed - High\n")
-            f.write("\n")
-            f.write("Total Transaction Event:"+str(self.txnEventCounter[node.nodeID])+"\n")
-            f.write("\n")
-            f.write("**Blocks in the Blockchain**\n")
-            totalBlocks,blockMined=self.writeBlockChain(f,node)
-            f.write("**Blocks in the Longest Chain**\n")
-            totalBlocksInLongestChain,blockMinedByNodeInChain=self.writeLongestChain(f,node)                
-            f.write("Total Blocks in the Chain:"+str(totalBlocks)+"\n")
-            f.write("Total Blocks in the Longest Chain:"+str(totalBlocksInLongestChain)+"\n")
-            f.write("\n")
-            f.write(f"Blocks Mined - {blockMined}\n")
-            f.write(f"Blocks Mined in the Longest Chain - {blockMinedByNodeInChain}\n")
+            self.writeNodeLog(f,node,txnEventCounter[node.nodeID])
             f.close()
+        delays=self.blockStore.propagationDelays()
+        delays=delays[delays>0]
+        if len(delays):
+            print("Block Propagation Time (Median, 90th Percentile):",*np.percentile(delays,[50,90]))
         print("Stats Generated. Saved in outputs/log_node(i).txt\n")
@@ -0,0 +1,132 @@
+import math
+from abc import ABC, abstractmethod
+
+class StopCondition(ABC):
+    """
+    Goal-based stopping condition of a simulation.
+
+    The simulator feeds every processed block event (finish mining and
+    receive block) to update(), so conditions keep their statistics
+    incrementally, and stops (then drains the in-flight block events
+    as at simTime) once update() returns True.
+
+    Methods:
+    - update(event): Accounts for a processed block event, returns True once the goal is reached.
+    - __str__(): Returns the goal and its current progress.
+    """
+    @abstractmethod
+    def update(self, event):
+        pass
+
+class MainChainLength(StopCondition):
+    """
+    Stops once the longest chain known by a node
+    holds the given number of blocks (genesis excluded)
+    """
+    def __init__(self, blocks):
+        if blocks<1:
+            raise ValueError("Invalid Number of Blocks")
+        self.blocks = blocks
+        self.length = 0
+
+    def update(self, event):
+        length = event.receiverPeer.blockchain.lastBlock.length-1
+        if length > self.length:
+            self.length = length
+        return self.length >= self.blocks
+
+    def __str__(self):
+        return f"{self.length}/{self.blocks} blocks on the main chain"
+
+class MainChainTracker:
+    """
+    Incrementally maintained main chain: the longest chain adopted
+    by any node (first seen wins ties), with the number of its blocks
+    and of all the blocks seen so far per miner.
+
+    Attributes:
+    - chain (list[Block]): Main chain, chain[i] has length i+1.
+    - onChain (dict<NodeID, int>): Blocks of each miner on the main chain.
+    - mined (dict<NodeID, int>): Blocks of each miner seen so far.
+    """
+    def __init__(self):
+        self.chain = []
+        self.onChain = dict()
+        self.mined = dict()
+        self.seen = set()
+
+    def count(self, counter, block, delta):
+        if block.miner is not None:
+            counter[block.miner.nodeID] = counter.get(block.miner.nodeID, 0)+delta
+
+    def update(self, event):
+        node = event.receiverPeer
+        block = event.block
+        # A block counts as mined once a node holds it
+        if block.blockID not in self.seen and block.blockID in node.blockchain.rcvdBlocks:
+            self.seen.add(block.blockID)
+            self.count(self.mined, block, 1)
+
+        tip = node.blockchain.lastBlock
+        if tip.length <= len(self.chain):
+            return
+        # Walk back to the fork point, only
+        # the blocks of the reorganization are visited
+        added = []
+        block = tip
+        while block.length > len(self.chain) or self.chain[block.length-1].blockID != block.blockID:
+            added.append(block)
+            if block.length == 1:
+                break
+            block = node.blockchain.rcvdBlocks[block.prevBlockID]
+        forkLength = added[-1].length-1
+        while len(self.chain) > forkLength:
+            self.count(self.onChain, self.chain.pop(), -1)
+        for block in reversed(added):
+            self.chain.append(block)
+            self.count(self.onChain, block, 1)
+
+class MinerUtilizationPrecision(StopCondition):
+    """
+    Stops once the confidence interval of the mining power
+    utilization (blocks on the main chain / blocks mined)
+    of each of the given miners is narrower than +/- epsilon.
+
+    Each mined block is treated as a Bernoulli trial (ends on the
+    main chain or not) with a Wilson score interval, and at least
+    minBlocks blocks of each miner are needed. Blocks withheld by a
+    selfish miner count as off-chain until they are released.
+    """
+    def __init__(self, nodeIDs, epsilon, z=1.96, minBlocks=30):
+        if epsilon<=0 or z<=0 or minBlocks<1 or not nodeIDs:
+            raise ValueError("Invalid Precision Goal")
+        self.nodeIDs = list(nodeIDs)
+        self.epsilon = epsilon
+        self.z = z
+        self.minBlocks = minBlocks
+        self.tracker = MainChainTracker()
+
+    def estimate(self, nodeID):
+        """
+        Return: (MPU estimate, confidence half-width)
+        """
+        n = self.tracker.mined.get(nodeID, 0)
+        if n == 0:
+            return 0, float("inf")
+        mpu = min(self.tracker.onChain.get(nodeID, 0)/n, 1)
+        z2 = self.z*self.z
+        return mpu, self.z/(1+z2/n)*math.sqrt(mpu*(1-mpu)/n+z2/(4*n*n))
+
+    def update(self, event):
+        self.tracker.update(event)
+        for nodeID in self.nodeIDs:
+            if self.tracker.mined.get(nodeID, 0) < self.minBlocks or self.estimate(nodeID)[1] >= self.epsilon:
+                return False
+        return True
+
+    def __str__(self):
+        res=[]
+        for nodeID in self.nodeIDs:
+            mpu, halfWidth = self.estimate(nodeID)
+            res.append(f"MPU({nodeID})={mpu:.4f} +/- {halfWidth:.4f}")
+        return ", ".join(res)+f" (goal +/- {self.epsilon})"
@@ -0,0 +1,61 @@
+from helper.utils import idLanes
+
+class TxnBitset:
+    """
+    Set of transactions stored as one bitmap per ID lane.
+
+    generateTransactionID issues the IDs of a node in its own lane, where
+    they are consecutive, so the bitmap of a lane is indexed by the rank
+    of the ID in it (txnID // lanes). A node's received transactions take
+    one bit per transaction issued so far by each node, however uneven
+    the lanes are, instead of a hash table entry per transaction, and
+    membership is a single bit test. The bitmaps are created on the first
+    ID of their lane and grow by doubling. Only the IDs are kept,
+    iteration is not supported.
+
+    Methods:
+    - add(txn): Adds a transaction.
+    - __contains__(txn): Membership test.
+    """
+    __slots__ = ("lanes", "bits", "count")
+
+    def __init__(self):
+        self.lanes = idLanes()
+        self.bits = [None]*self.lanes
+        self.count = 0
+
+    def add(self, txn):
+        rank, lane = divmod(txn.txnID, self.lanes)
+        bits = self.bits[lane]
+        byte = rank >> 3
+        if bits is None:
+            bits = self.bits[lane] = bytearray(max(byte+1, 8))
+        elif byte >= len(bits):
+            bits.extend(bytes(max(byte+1, 2*len(bits))-len(bits)))
+        mask = 1 << (rank & 7)
+        if not bits[byte] & mask:
+            bits[byte] |= mask
+            self.count += 1
+
+    def __contains__(self, txn):
+        rank, lane = divmod(txn.txnID, self.lanes)
+        bits = self.bits[lane]
+        byte = rank >> 3
+        return bits is not None and byte < len(bits) and bits[byte] >> (rank & 7) & 1 == 1
+
+    def __len__(self):
+        return self.count
+
+    def __getstate__(self):
+        return (self.lanes, [None if bits is None else bytes(bits) for bits in self.bits], self.count)
+
+    def __setstate__(self, state):
+        self.lanes = state[0]
+        self.bits = [None if bits is None else bytearray(bits) for bits in state[1]]
+        self.count = state[2]
+
+# Backends of BlockChain.rcvdTxns
+TXN_STORES = {
+    "set": set,
+    "bitset": TxnBitset,
+}
@@ -0,0 +1,95 @@
+# Leaves are bitmaps (Python ints) of 2**LEAF_BITS consecutive txn IDs,
+# inner nodes are tuples of 2**FANOUT_BITS children (None when empty)
+LEAF_BITS = 10
+FANOUT_BITS = 5
+FANOUT = 1 << FANOUT_BITS
+
+class TxnIndex:
+    """
+    Persistent (immutable) set of transaction IDs.
+
+    A chunked bitmap trie over the txn IDs: each leaf holds the bits of
+    1024 consecutive IDs and inner nodes have 32 children.
+    Adding IDs returns a new index which shares every untouched node
+    with the old one, so a block's index costs memory proportional to
+    the transactions it adds, and membership is O(log n).
+
+    Attributes:
+    - root (tuple | int | None): Root node.
+    - depth (int): Number of inner levels above the leaves.
+    - size (int): Number of IDs in the set.
+
+    Methods:
+    - __contains__(txnID): Membership test.
+    - addAll(txnIDs): Returns a new index with the IDs added.
+    """
+    __slots__ = ("root", "depth", "size")
+
+    def __init__(self, root=None, depth=0, size=0):
+        self.root = root
+        self.depth = depth
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, txnID):
+        if txnID < 0 or txnID >> (LEAF_BITS+FANOUT_BITS*self.depth):
+            return False
+        node = self.root
+        shift = LEAF_BITS+FANOUT_BITS*(self.depth-1)
+        for _ in range(self.depth):
+            if node is None:
+                return False
+            node = node[(txnID >> shift) & (FANOUT-1)]
+            shift -= FANOUT_BITS
+        return node is not None and (node >> (txnID & ((1 << LEAF_BITS)-1))) & 1 == 1
+
+    def addAll(self, txnIDs):
+        txnIDs = sorted(txnIDs)
+        if not txnIDs:
+            return self
+        if txnIDs[0] < 0:
+            raise ValueError("Transaction IDs must not be negative")
+        root, depth = self.root, self.depth
+        # Grow the trie until the largest ID fits
+        while txnIDs[-1] >> (LEAF_BITS+FANOUT_BITS*depth):
+            if root is not None:
+                root = (root,)+(None,)*(FANOUT-1)
+            depth += 1
+        root, added = insert(root, depth, txnIDs)
+        return TxnIndex(root, depth, self.size+added)
+
+    def __getstate__(self):
+        return (self.root, self.depth, self.size)
+
+    def __setstate__(self, state):
+        self.root, self.depth, self.size = state
+
+def insert(node, level, txnIDs):
+    """
+    Returns the copy of node with the sorted txnIDs\n
+    added, and the number of IDs actually added
+    """
+    if level == 0:
+        bits = node or 0
+        new = bits
+        for txnID in txnIDs:
+            new |= 1 << (txnID & ((1 << LEAF_BITS)-1))
+        return new, bin(new).count("1")-bin(bits).count("1")
+    children = list(node) if node is not None else [None]*FANOUT
+    shift = LEAF_BITS+FANOUT_BITS*(level-1)
+    added = 0
+    start = 0
+    # IDs are sorted, so each child gets a contiguous run
+    while start < len(txnIDs):
+        i = (txnIDs[start] >> shift) & (FANOUT-1)
+        end = start+1
+        while end < len(txnIDs) and (txnIDs[end] >> shift) & (FANOUT-1) == i:
+            end += 1
+        children[i], childAdded = insert(children[i], level-1, txnIDs[start:end])
+        added += childAdded
+        start = end
+    return tuple(children), added
+
+EMPTY_TXN_INDEX = TxnIndex()
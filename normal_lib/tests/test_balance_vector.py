@@ -0,0 +1,24 @@
+import pytest
+from models.balance_vector import BalanceVector
+
+def test_update_returns_a_new_vector():
+    balances = BalanceVector.fromList(float(i) for i in range(100))
+    updated = balances.update({3: 1.5, 99: -99.0})
+    assert balances[3] == 3.0 and balances[99] == 99.0
+    assert updated[3] == 4.5 and updated[99] == 0.0
+    assert updated.tolist()[:3] == [0.0, 1.0, 2.0] and len(updated) == 100
+    assert updated.take([0, 3]) == [0.0, 4.5]
+    assert balances.update({}) is balances
+
+def test_untouched_leaves_are_shared():
+    balances = BalanceVector.fromList([0.0]*2000)
+    updated = balances.update({1999: 1.0})
+    assert updated.root[0] is balances.root[0]
+    assert updated.root[1] is not balances.root[1]
+
+def test_accounts_out_of_range():
+    balances = BalanceVector.fromList([1.0]*5)
+    with pytest.raises(IndexError):
+        balances[5]
+    with pytest.raises(IndexError):
+        balances.update({5: 1.0})
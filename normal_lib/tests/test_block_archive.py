@@ -0,0 +1,75 @@
+import os
+import pickle
+from types import SimpleNamespace
+import numpy as np
+from models.block_archive import BlockArchive
+from models.transaction import TransactionTable
+
+NUM_NODES = 3
+
+def makeBlocks(blockIDs):
+    nodes = [SimpleNamespace(nodeID=i) for i in range(NUM_NODES)]
+    return [SimpleNamespace(
+        blockID=blockID, prevBlockID=blockID-1, miner=nodes[blockID % NUM_NODES],
+        length=i+2, size=1.5, txnIDs=np.array([blockID*10, blockID*10+1]),
+        deltas={blockID % NUM_NODES: 50.0},
+    ) for i, blockID in enumerate(blockIDs)], nodes
+
+def archiveState(blocks):
+    arrival = np.arange(len(blocks)*NUM_NODES, dtype=float).reshape(len(blocks), NUM_NODES)
+    return arrival, np.ones((len(blocks), NUM_NODES), dtype=np.uint8)
+
+def fileSizes(path):
+    return {name: os.path.getsize(f"{path}.{name}") for name in ("blocks", "txns", "deltas", "index")}
+
+def test_round_trip_with_sparse_ids(tmp_path):
+    # Lane interleaved IDs, far apart and out of order
+    blocks, nodes = makeBlocks([9001, 17, 4242, 305])
+    archive = BlockArchive(str(tmp_path/"a"), NUM_NODES, nodes, TransactionTable())
+    archive.append(blocks[:2], *archiveState(blocks[:2]))
+    archive.append(blocks[2:], *archiveState(blocks[2:]))
+    # Appends only grow the pending positions
+    assert os.path.getsize(str(tmp_path/"a.index")) == 0
+    assert archive.record(4242)["blockID"] == 4242
+    archive.flush()
+    assert os.path.getsize(str(tmp_path/"a.index")) == 4*16
+    for block in blocks:
+        archived = archive.block(block.blockID)
+        assert (archived.prevBlockID, archived.miner, archived.length) == (block.prevBlockID, block.miner, block.length)
+        assert archived.txnIDs.tolist() == block.txnIDs.tolist()
+        assert archived.deltas == block.deltas
+    assert archive.record(18) is None
+    assert archive.records()["blockID"].tolist() == [9001, 17, 4242, 305]
+
+def test_lookup_cache_keeps_the_last_window_blocks(tmp_path):
+    blocks, nodes = makeBlocks(list(range(10, 20)))
+    archive = BlockArchive(str(tmp_path/"a"), NUM_NODES, nodes, TransactionTable(), window=3)
+    archive.append(blocks, *archiveState(blocks))
+    first = archive.block(10)
+    archive.block(11)
+    archive.block(10)
+    archive.block(12)
+    archive.block(13)
+    # 11 was the least recently used
+    assert list(archive.cache) == [10, 12, 13]
+    assert archive.block(10) is first
+
+def test_loading_a_checkpoint_leaves_the_files_untouched(tmp_path):
+    path = str(tmp_path/"a")
+    blocks, nodes = makeBlocks(list(range(2, 12)))
+    archive = BlockArchive(path, NUM_NODES, nodes, TransactionTable())
+    archive.append(blocks[:5], *archiveState(blocks[:5]))
+    state = pickle.dumps(archive)
+    archive.append(blocks[5:], *archiveState(blocks[5:]))
+    archive.flush()
+    grown = fileSizes(path)
+
+    restored = pickle.loads(state)
+    assert fileSizes(path) == grown
+    assert restored.record(4)["blockID"] == 4
+    assert restored.record(9) is None
+    # Cut back to the checkpoint on the first append
+    restored.append(blocks[7:8], *archiveState(blocks[7:8]))
+    restored.flush()
+    assert restored.records()["blockID"].tolist() == [2, 3, 4, 5, 6, 9]
+    assert fileSizes(path)["index"] == 6*16
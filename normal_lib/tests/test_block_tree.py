@@ -0,0 +1,67 @@
+from types import SimpleNamespace
+from models.block_tree import BlockTree, skipLength
+
+class Store:
+    """
+    Blocks of a BlockStore, enough for BlockTree
+    """
+    def __init__(self):
+        self.blocks = []
+        self.rows = dict()
+        self.finalLength = 0
+        self.archive = None
+        self.tree = BlockTree(self)
+
+    def add(self, blockID, parent=None):
+        block = SimpleNamespace(blockID=blockID, prevBlockID=parent.blockID if parent else 0, length=parent.length+1 if parent else 1)
+        self.rows[blockID] = len(self.blocks)
+        self.blocks.append(block)
+        self.tree.add(self.rows[blockID])
+        return block
+
+def chain(store, parent, firstID, count):
+    blocks = []
+    for blockID in range(firstID, firstID+count):
+        parent = store.add(blockID, parent)
+        blocks.append(parent)
+    return blocks
+
+def test_skip_lengths_point_back():
+    assert all(1 <= skipLength(length) < length for length in range(2, 5000))
+
+def test_ancestor_takes_logarithmic_jumps():
+    store = Store()
+    genesis = store.add(1)
+    blocks = chain(store, genesis, 2, 4096)
+    tip = blocks[-1]
+    for length in (1, 2, 777, 2048, 4096, 4097):
+        assert store.tree.ancestor(tip, length).length == length
+    # Every skip pointer lands on the block of its skip length
+    for row, skip in enumerate(store.tree.skip):
+        if skip != -1:
+            assert store.blocks[skip].length == skipLength(store.blocks[row].length)
+    assert store.tree.skip.count(-1) == 1
+
+def test_common_ancestor_and_reorg_depth():
+    store = Store()
+    genesis = store.add(1)
+    trunk = chain(store, genesis, 2, 300)
+    fork = trunk[199]
+    branchA = chain(store, fork, 1000, 30)
+    branchB = chain(store, fork, 2000, 5)
+    assert store.tree.commonAncestor(branchA[-1], branchB[-1]) is fork
+    assert store.tree.commonAncestor(trunk[-1], branchB[-1]) is fork
+    assert store.tree.reorgDepth(branchB[-1], branchA[-1]) == 5
+    assert store.tree.reorgDepth(fork, branchA[-1]) == 0
+
+def test_children_registered_before_their_parent_wait():
+    store = Store()
+    genesis = store.add(1)
+    parent = SimpleNamespace(blockID=2, prevBlockID=1, length=2)
+    child = SimpleNamespace(blockID=3, prevBlockID=2, length=3)
+    for block in (child, parent):
+        store.rows[block.blockID] = len(store.blocks)
+        store.blocks.append(block)
+        store.tree.add(store.rows[block.blockID])
+    assert store.tree.waiting == dict()
+    assert store.tree.ancestor(child, 1) is genesis
@@ -0,0 +1,56 @@
+import random
+import pytest
+from helper.event_queue import EVENT_QUEUE_ENGINES, HeapEventQueue, CalendarEventQueue
+
+@pytest.mark.parametrize("engine", sorted(EVENT_QUEUE_ENGINES))
+def test_ties_pop_in_sequence_order(engine):
+    queue = EVENT_QUEUE_ENGINES[engine]()
+    for sequence in (5, 2, 9, 1):
+        queue.push(3.0, sequence, f"e{sequence}")
+    queue.push(1.0, 7, "early")
+    assert [queue.pop()[1] for _ in range(5)] == ["early", "e1", "e2", "e5", "e9"]
+
+def test_calendar_pops_like_the_heap():
+    rng = random.Random(3)
+    heap, calendar = HeapEventQueue(), CalendarEventQueue()
+    now = 0.0
+    for sequence in range(20000):
+        if rng.random() < 0.55 or not len(heap):
+            # Bursts of equal times, far future and past-the-cursor events
+            time = now+rng.choice([rng.expovariate(1), 0.0, 100*rng.random(), round(rng.random(), 1)])
+            heap.push(time, sequence, sequence)
+            calendar.push(time, sequence, sequence)
+        elif rng.random() < 0.5:
+            assert calendar.peek() == heap.peek()
+        else:
+            entry = heap.pop()
+            assert calendar.pop() == entry
+            now = entry[0]
+    while len(heap):
+        assert calendar.pop() == heap.pop()
+    assert len(calendar) == 0
+
+def test_calendar_peek_does_not_change_the_queue():
+    calendar = CalendarEventQueue()
+    for sequence, time in enumerate([4.0, 2.5, 9.0, 2.5]):
+        calendar.push(time, sequence, sequence)
+    buckets = [list(bucket) for bucket in calendar.buckets]
+    cursor = (calendar.lastBucket, calendar.lastSlot)
+    assert calendar.peek() == (2.5, 1)
+    assert [list(bucket) for bucket in calendar.buckets] == buckets
+    assert (calendar.lastBucket, calendar.lastSlot) == cursor
+    # An earlier push replaces the cached head
+    calendar.push(1.0, 4, 4)
+    assert calendar.peek() == (1.0, 4)
+    assert [calendar.pop() for _ in range(5)] == [(1.0, 4), (2.5, 1), (2.5, 3), (4.0, 0), (9.0, 2)]
+
+def test_calendar_compact_drops_dead_events():
+    calendar = CalendarEventQueue()
+    for sequence in range(50):
+        calendar.push(float(sequence % 7), sequence, sequence)
+    calendar.peek()
+    calendar.compact(lambda event: event % 2 == 0)
+    assert len(calendar) == 25
+    popped = [calendar.pop() for _ in range(25)]
+    assert popped == sorted(popped, key=lambda entry: (entry[0], entry[1]))
+    assert all(event % 2 == 0 for _, event in popped)
@@ -0,0 +1,20 @@
+from helper.utils import initialize_rand_generator
+from models.simulator import Simulator
+from models.checkpoint import saveCheckpoint
+from models.parallel import compareToSequential
+
+def test_parallel_logs_match_the_sequential_run(tmp_path):
+    initialize_rand_generator(11)
+    simulator = Simulator(8, 20, 0.5, 0.5, 200, 1500, partitions=2)
+    simulator.generateNetwork()
+    simulator.generateTransaction()
+    simulator.generateBlock()
+    startPath = str(tmp_path/"start.gz")
+    saveCheckpoint(simulator, startPath)
+    simulator.simulate()
+    try:
+        assert compareToSequential(simulator, startPath) == []
+    finally:
+        initialize_rand_generator()
+    # Blocks were mined and crossed the partitions
+    assert all(log.count("Previous Block ID:1,") > 0 for log in simulator.nodeLogs())
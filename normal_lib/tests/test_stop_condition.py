@@ -0,0 +1,29 @@
+import pytest
+from helper.utils import initialize_rand_generator
+from models.simulator import Simulator
+from models.stop_condition import MainChainLength
+
+@pytest.mark.parametrize("miningMode", ["node", "global"])
+def test_main_chain_length_stops_when_the_block_is_mined(miningMode):
+    initialize_rand_generator(7)
+    simulator = Simulator(8, 10, 0.5, 0.5, 100, 10**6, miningMode=miningMode, blockOnly=True)
+    simulator.generateNetwork()
+    simulator.generateTransaction()
+    simulator.generateBlock()
+    simulator.addStopCondition(MainChainLength(5))
+    stops = []
+    goalReached = simulator.goalReached
+    def recordStop(event):
+        reached = goalReached(event)
+        if reached:
+            stops.append(event)
+        return reached
+    simulator.goalReached = recordStop
+    simulator.simulate()
+    # The miner adopting its own block reaches the goal,
+    # not a peer receiving it later
+    event, = stops
+    assert event.type == 3
+    assert event.block.miner is event.receiverPeer
+    assert event.block.length-1 == 5
+    initialize_rand_generator()
@@ -0,0 +1,20 @@
+import numpy as np
+import helper.utils as utils
+from models.transaction import TransactionTable, Transaction, LANE_RUN_BITS
+
+def test_rows_grow_with_the_transactions_not_the_id_spread():
+    utils.initialize_id_spaces(101)
+    try:
+        table = TransactionTable()
+        # Lane 3 issues 5000 IDs, lane 7 a single one
+        txnIDs = [rank*101+3 for rank in range(5000)]+[7]
+        for i, txnID in enumerate(txnIDs):
+            Transaction(txnID, float(i), 7, 3, table=table)
+    finally:
+        utils.initialize_id_spaces(1)
+    assert table.numRows == (-(-5000 >> LANE_RUN_BITS)+1) << LANE_RUN_BITS
+    assert len(table.values) < max(txnIDs)//10
+    assert table.view(txnIDs[1234]).val == 1234.0
+    assert table.row(7) == (5000.0, 7, 3, 0)
+    rows = table.rows(np.array(txnIDs))
+    assert table.values[rows].tolist() == [float(i) for i in range(5001)]
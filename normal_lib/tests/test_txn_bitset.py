@@ -0,0 +1,27 @@
+import pickle
+from types import SimpleNamespace
+import helper.utils as utils
+from models.txn_bitset import TxnBitset
+
+def txn(txnID):
+    return SimpleNamespace(txnID=txnID)
+
+def test_one_dense_bitmap_per_lane():
+    utils.initialize_id_spaces(11)
+    try:
+        bitset = TxnBitset()
+    finally:
+        utils.initialize_id_spaces(1)
+    # Lane 4 issues 1000 IDs, lane 9 a single one
+    for rank in range(1000):
+        bitset.add(txn(rank*11+4))
+    bitset.add(txn(9))
+    bitset.add(txn(4))
+    assert len(bitset) == 1001
+    assert len(bitset.bits[4]) < 256 and len(bitset.bits[9]) == 8
+    assert bitset.bits[0] is None
+    assert txn(999*11+4) in bitset and txn(9) in bitset
+    assert txn(5) not in bitset and txn(1000*11+4) not in bitset and txn(20) not in bitset
+
+    restored = pickle.loads(pickle.dumps(bitset))
+    assert len(restored) == 1001 and txn(500*11+4) in restored and txn(3) not in restored
@@ -0,0 +1,29 @@
+import random
+from models.txn_index import TxnIndex
+
+def test_add_all_is_persistent():
+    empty = TxnIndex()
+    first = empty.addAll([5, 3000, 70])
+    second = first.addAll([70, 2**20+1])
+    assert len(empty) == 0 and 5 not in empty
+    assert len(first) == 3 and 2**20+1 not in first
+    assert len(second) == 4
+    assert all(txnID in second for txnID in (5, 70, 3000, 2**20+1))
+    assert 6 not in second and -1 not in second and 2**40 not in second
+
+def test_untouched_subtrees_are_shared():
+    low = TxnIndex().addAll(range(0, 5000, 3))
+    high = low.addAll([4999])
+    # Only the path to the leaf of 4999 is copied
+    assert high.root[0] is low.root[0]
+    assert high.root[4] is not low.root[4]
+
+def test_matches_a_set():
+    rng = random.Random(5)
+    index, reference = TxnIndex(), set()
+    for _ in range(30):
+        batch = [rng.randrange(200000) for _ in range(rng.randrange(1, 50))]
+        index = index.addAll(batch)
+        reference.update(batch)
+    assert len(index) == len(reference)
+    assert all((txnID in index) == (txnID in reference) for txnID in range(0, 200000, 7))
@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+import helper.utils as utils
+
+LIB_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def draws(seed):
+    utils.initialize_rand_generator(seed)
+    return list(utils.randomGenerator.integers(0, 2**32, size=8))
+
+def test_seed_zero_is_not_replaced_by_the_default():
+    try:
+        zero = draws(0)
+        assert utils.randomSeed == 0
+        assert zero != draws(42)
+    finally:
+        utils.initialize_rand_generator()
+
+def test_import_reads_no_config():
+    # Bad P2PSIM_* values are reported by main, not at import
+    env = dict(os.environ, P2PSIM_MINING_FEE="abc")
+    result = subprocess.run([sys.executable, "-c", "import helper.utils"], cwd=LIB_DIR, env=env, capture_output=True)
+    assert result.returncode == 0, result.stderr.decode()